@@ -0,0 +1,43 @@
+import os
+
+# Idempotency-Key replay window and in-process cache size
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+# A key still in progress after this long belongs to a request that died before committing
+IDEMPOTENCY_IN_PROGRESS_TIMEOUT_SECONDS = int(os.getenv("IDEMPOTENCY_IN_PROGRESS_TIMEOUT_SECONDS", "120"))
+
+# Maximum age of cached /dashboard/metrics answers (writes in this process invalidate sooner)
+DASHBOARD_CACHE_MAX_AGE_SECONDS = float(os.getenv("DASHBOARD_CACHE_MAX_AGE_SECONDS", "30"))
+
+# Parquet snapshots read by the analytics engine (reports with source=analytics)
+ANALYTICS_DIR = os.getenv("ANALYTICS_DIR", os.path.join(os.path.dirname(__file__), "analytics_data"))
+# Each incremental snapshot rewrites the months overlapping this many trailing days
+ANALYTICS_REEXPORT_DAYS = int(os.getenv("ANALYTICS_REEXPORT_DAYS", "7"))
+# Files a new snapshot replaced are kept this long for queries still reading them
+ANALYTICS_RETIRED_GRACE_SECONDS = float(os.getenv("ANALYTICS_RETIRED_GRACE_SECONDS", "600"))
+
+# Read replica (DATABASE_READ_URL): reads fall back to the primary when the
+# replica is unreachable or its replay lag exceeds this many seconds
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_CHECK_INTERVAL_SECONDS = float(os.getenv("REPLICA_CHECK_INTERVAL_SECONDS", "2"))
+
+# Background report jobs (POST /reports/jobs)
+REPORT_JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", "2"))
+REPORT_JOB_STATEMENT_TIMEOUT_SECONDS = float(os.getenv("REPORT_JOB_STATEMENT_TIMEOUT_SECONDS", "300"))
+
+# Demand forecast behind the min_stock recommendations (python -m jobs.forecast_demand)
+FORECAST_WINDOW_DAYS = int(os.getenv("FORECAST_WINDOW_DAYS", "90"))
+FORECAST_LEAD_TIME_DAYS = float(os.getenv("FORECAST_LEAD_TIME_DAYS", "7"))
+FORECAST_SERVICE_LEVEL_Z = float(os.getenv("FORECAST_SERVICE_LEVEL_Z", "1.65"))  # ~95% of lead times covered
+
+# Cached /reports/heatmap windows (sale writes in this process invalidate them sooner)
+HEATMAP_CACHE_MAX_AGE_SECONDS = float(os.getenv("HEATMAP_CACHE_MAX_AGE_SECONDS", "300"))
+HEATMAP_CACHE_SIZE = int(os.getenv("HEATMAP_CACHE_SIZE", "64"))
+
+# Cached /reports/abc classifications, shared by the pages of a window
+ABC_CACHE_MAX_AGE_SECONDS = float(os.getenv("ABC_CACHE_MAX_AGE_SECONDS", "300"))
+ABC_CACHE_SIZE = int(os.getenv("ABC_CACHE_SIZE", "8"))
+
+# Document numbers (PO, RST, receipts) each worker reserves per database round trip;
+# on PostgreSQL this is the sequences' INCREMENT BY when they are created
+DOCUMENT_NUMBER_BLOCK_SIZE = int(os.getenv("DOCUMENT_NUMBER_BLOCK_SIZE", "50"))
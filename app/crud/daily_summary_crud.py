@@ -0,0 +1,209 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select, insert, literal
+from sqlalchemy.dialects import postgresql, sqlite
+from datetime import datetime
+from models.daily_summary import DailySummary
+from models.product_daily_sales import ProductDailySales
+from models.sale import Sale
+from models.sale_detail import SaleDetail
+from crud import pagination
+
+# pg_advisory_xact_lock key: sales take it shared, rebuilds exclusively
+SUMMARY_LOCK_ID = 100_001
+
+def lock_summaries(db: Session, exclusive: bool = False):
+    """Serializa los rebuilds contra las ventas que suman a los resúmenes.
+
+    Un rebuild espera a que confirmen las ventas en curso y las nuevas
+    esperan a que termine, así ninguna venta se pierde ni se cuenta dos
+    veces. Las ventas deben tomarlo antes de bloquear productos: el rebuild
+    lo tiene mientras sus inserts comprueban las FKs a products. Solo
+    PostgreSQL; SQLite ya serializa las escrituras.
+    """
+    if db.get_bind().dialect.name != 'postgresql':
+        return
+    lock = func.pg_advisory_xact_lock if exclusive else func.pg_advisory_xact_lock_shared
+    db.execute(select(lock(SUMMARY_LOCK_ID)))
+
+def _dialect_insert(db: Session):
+    if db.get_bind().dialect.name == 'sqlite':
+        return sqlite.insert
+    return postgresql.insert
+
+def record_sales(db: Session, sales, sign: int = 1):
+    """Suma (o resta con sign=-1) ventas al resumen de su día, sin confirmar.
+
+    sales: iterable de (fecha, total, unidades vendidas, líneas).
+    Debe ejecutarse en la misma transacción que modifica las ventas.
+    """
+    per_day = {}
+    for moment, total, quantity, lines in sales:
+        day = per_day.setdefault(moment.date(), [0, 0.0, 0, 0])
+        day[0] += sign
+        day[1] += sign * total
+        day[2] += sign * quantity
+        day[3] += sign * lines
+    if not per_day:
+        return
+    lock_summaries(db)
+    now = datetime.utcnow()
+    # Rows in date order so concurrent writers lock summaries consistently
+    stmt = _dialect_insert(db)(DailySummary).values([
+        {
+            'date': day,
+            'total_sales': count,
+            'total_revenue': revenue,
+            'total_products_sold': quantity,
+            'total_transactions': lines,
+            'created_at': now,
+            'updated_at': now
+        }
+        for day, (count, revenue, quantity, lines) in sorted(per_day.items())
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailySummary.date],
+        set_={
+            'total_sales': DailySummary.total_sales + stmt.excluded.total_sales,
+            'total_revenue': DailySummary.total_revenue + stmt.excluded.total_revenue,
+            'total_products_sold': DailySummary.total_products_sold + stmt.excluded.total_products_sold,
+            'total_transactions': DailySummary.total_transactions + stmt.excluded.total_transactions,
+            'updated_at': stmt.excluded.updated_at
+        }
+    )
+    db.execute(stmt)
+
+def record_product_sales(db: Session, lines, sign: int = 1):
+    """Suma (o resta con sign=-1) líneas de venta al resumen por producto y día.
+
+    lines: iterable de (fecha, product_id, cantidad, subtotal).
+    Misma transacción que las ventas, igual que record_sales.
+    """
+    per_product_day = {}
+    for moment, product_id, quantity, subtotal in lines:
+        entry = per_product_day.setdefault((moment.date(), product_id), [0, 0.0])
+        entry[0] += sign * quantity
+        entry[1] += sign * subtotal
+    if not per_product_day:
+        return
+    lock_summaries(db)
+    now = datetime.utcnow()
+    stmt = _dialect_insert(db)(ProductDailySales).values([
+        {
+            'date': day,
+            'product_id': product_id,
+            'quantity': quantity,
+            'revenue': revenue,
+            'created_at': now,
+            'updated_at': now
+        }
+        for (day, product_id), (quantity, revenue) in sorted(per_product_day.items())
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ProductDailySales.product_id, ProductDailySales.date],
+        set_={
+            'quantity': ProductDailySales.quantity + stmt.excluded.quantity,
+            'revenue': ProductDailySales.revenue + stmt.excluded.revenue,
+            'updated_at': stmt.excluded.updated_at
+        }
+    )
+    db.execute(stmt)
+
+def rebuild_daily_summaries(db: Session, start_date=None, end_date=None):
+    """Recalcula los resúmenes diarios a partir de sales y sale_details"""
+    lock_summaries(db, exclusive=True)
+    start, end = pagination.day_range(start_date, end_date)
+
+    def in_range(query, column):
+        if start:
+            query = query.where(column >= start)
+        if end:
+            query = query.where(column < end)
+        return query
+
+    sales_per_day = in_range(select(
+        func.date(Sale.fecha).label('day'),
+        func.count(Sale.id).label('total_sales'),
+        func.sum(Sale.total).label('total_revenue')
+    ), Sale.fecha).group_by(func.date(Sale.fecha)).subquery()
+    lines_per_day = in_range(select(
+        func.date(Sale.fecha).label('day'),
+        func.sum(SaleDetail.quantity).label('total_products_sold'),
+        func.count(SaleDetail.id).label('total_transactions')
+    ).join(SaleDetail, SaleDetail.sale_id == Sale.id), Sale.fecha).group_by(func.date(Sale.fecha)).subquery()
+
+    delete_query = db.query(DailySummary)
+    if start_date:
+        delete_query = delete_query.filter(DailySummary.date >= start_date)
+    if end_date:
+        delete_query = delete_query.filter(DailySummary.date <= end_date)
+    delete_query.delete(synchronize_session=False)
+
+    now = datetime.utcnow()
+    db.execute(insert(DailySummary).from_select(
+        ['date', 'total_sales', 'total_revenue', 'total_products_sold',
+         'total_transactions', 'created_at', 'updated_at'],
+        select(
+            sales_per_day.c.day,
+            sales_per_day.c.total_sales,
+            sales_per_day.c.total_revenue,
+            func.coalesce(lines_per_day.c.total_products_sold, 0),
+            func.coalesce(lines_per_day.c.total_transactions, 0),
+            literal(now, DailySummary.created_at.type),
+            literal(now, DailySummary.updated_at.type)
+        ).outerjoin(lines_per_day, lines_per_day.c.day == sales_per_day.c.day)
+    ))
+    db.commit()
+
+def rebuild_product_daily_sales(db: Session, start_date=None, end_date=None):
+    """Recalcula el resumen por producto y día a partir de sale_details"""
+    lock_summaries(db, exclusive=True)
+    start, end = pagination.day_range(start_date, end_date)
+    per_product_day = select(
+        SaleDetail.product_id,
+        func.date(Sale.fecha).label('day'),
+        func.sum(SaleDetail.quantity),
+        func.sum(SaleDetail.subtotal)
+    ).join(Sale, SaleDetail.sale_id == Sale.id)
+    if start:
+        per_product_day = per_product_day.where(Sale.fecha >= start)
+    if end:
+        per_product_day = per_product_day.where(Sale.fecha < end)
+
+    delete_query = db.query(ProductDailySales)
+    if start_date:
+        delete_query = delete_query.filter(ProductDailySales.date >= start_date)
+    if end_date:
+        delete_query = delete_query.filter(ProductDailySales.date <= end_date)
+    delete_query.delete(synchronize_session=False)
+
+    now = datetime.utcnow()
+    db.execute(insert(ProductDailySales).from_select(
+        ['product_id', 'date', 'quantity', 'revenue', 'created_at', 'updated_at'],
+        per_product_day.add_columns(
+            literal(now, ProductDailySales.created_at.type),
+            literal(now, ProductDailySales.updated_at.type)
+        ).group_by(SaleDetail.product_id, func.date(Sale.fecha))
+    ))
+    db.commit()
+
+def get_daily_summary(db: Session, day):
+    return db.query(DailySummary).filter(DailySummary.date == day).first()
+
+def get_daily_summaries(db: Session, start_date, end_date):
+    return db.query(DailySummary).filter(
+        DailySummary.date >= start_date,
+        DailySummary.date <= end_date
+    ).order_by(DailySummary.date.desc()).all()
+
+def get_summary_periods(db: Session, start_date, end_date, granularity: str = 'day'):
+    """Suma los resúmenes diarios por semana o mes (o día)"""
+    period = pagination.period_bucket(db, DailySummary.date, granularity)
+    return db.query(
+        period.label('period'),
+        func.sum(DailySummary.total_sales).label('total_sales'),
+        func.sum(DailySummary.total_revenue).label('total_revenue'),
+        func.sum(DailySummary.total_products_sold).label('total_products_sold')
+    ).filter(
+        DailySummary.date >= start_date,
+        DailySummary.date <= end_date
+    ).group_by(period).order_by(period.desc()).all()
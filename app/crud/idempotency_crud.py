@@ -0,0 +1,116 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import hashlib
+import json
+import threading
+import time
+from models.idempotency_key import IdempotencyKey
+import config
+
+# In-process LRU of completed responses: (scope, key) -> (expires_at, request_hash, status_code, body)
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def hash_request(payload) -> str:
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+def _cache_get(scope: str, key: str):
+    with _cache_lock:
+        entry = _cache.get((scope, key))
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del _cache[(scope, key)]
+            return None
+        _cache.move_to_end((scope, key))
+        return entry
+
+def _cache_put(scope: str, key: str, request_hash: str, status_code: int, body):
+    with _cache_lock:
+        _cache[(scope, key)] = (
+            time.monotonic() + config.IDEMPOTENCY_TTL_SECONDS, request_hash, status_code, body
+        )
+        _cache.move_to_end((scope, key))
+        while len(_cache) > config.IDEMPOTENCY_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+def reserve_key(db: Session, scope: str, key: str, request_hash: str):
+    """Reserva una clave de idempotencia antes de ejecutar la operación.
+
+    Devuelve (respuesta_guardada, error). Si ambos son None la clave quedó
+    reservada y la operación debe ejecutarse.
+    """
+    entry = _cache_get(scope, key)
+    if entry:
+        if entry[1] != request_hash:
+            return None, "Idempotency-Key reused with a different payload"
+        return (entry[2], entry[3]), None
+
+    now = datetime.utcnow()
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.scope == scope,
+        IdempotencyKey.key == key,
+        or_(
+            IdempotencyKey.created_at < now - timedelta(seconds=config.IDEMPOTENCY_TTL_SECONDS),
+            and_(
+                IdempotencyKey.status == 'in_progress',
+                IdempotencyKey.created_at < now - timedelta(seconds=config.IDEMPOTENCY_IN_PROGRESS_TIMEOUT_SECONDS)
+            )
+        )
+    ).delete(synchronize_session=False)
+
+    db.add(IdempotencyKey(scope=scope, key=key, request_hash=request_hash, status='in_progress'))
+    try:
+        db.commit()
+        return None, None
+    except IntegrityError:
+        db.rollback()
+
+    existing = db.query(IdempotencyKey).filter(
+        IdempotencyKey.scope == scope,
+        IdempotencyKey.key == key
+    ).first()
+    if not existing:
+        return None, "Request with this Idempotency-Key is already in progress"
+    if existing.request_hash != request_hash:
+        return None, "Idempotency-Key reused with a different payload"
+    if existing.status != 'completed':
+        return None, "Request with this Idempotency-Key is already in progress"
+    body = json.loads(existing.response_body)
+    _cache_put(scope, key, request_hash, existing.status_code, body)
+    return (existing.status_code, body), None
+
+def record_response(db: Session, scope: str, key: str, status_code: int, body):
+    """Marca la clave como completada con su respuesta, sin confirmar.
+
+    Debe ejecutarse en la transacción de la operación, así la respuesta se
+    guarda junto con lo que creó y una clave nunca queda en curso tras un
+    commit exitoso.
+    """
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.scope == scope,
+        IdempotencyKey.key == key
+    ).update({
+        'status': 'completed',
+        'status_code': status_code,
+        'response_body': json.dumps(body, default=str)
+    }, synchronize_session=False)
+
+def remember_response(scope: str, key: str, request_hash: str, status_code: int, body):
+    # After the commit: replay from memory in this worker
+    _cache_put(scope, key, request_hash, status_code, body)
+
+def release_key(db: Session, scope: str, key: str):
+    """Libera una reserva cuando la operación falla, para permitir reintentos."""
+    db.rollback()
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.scope == scope,
+        IdempotencyKey.key == key,
+        IdempotencyKey.status == 'in_progress'
+    ).delete(synchronize_session=False)
+    db.commit()
@@ -0,0 +1,61 @@
+from datetime import date, datetime, time, timedelta
+import base64
+import json
+from sqlalchemy import func, cast, Date, DateTime, Integer
+
+def encode_cursor(moment: datetime, row_id: int) -> str:
+    """Token opaco con la posición (fecha, id) de la última fila devuelta"""
+    payload = json.dumps([moment.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(token: str):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        moment, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(moment), int(row_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+def day_range(date_from: date = None, date_to: date = None):
+    """Convierte un rango de días inclusivo en límites [inicio, fin) de timestamp"""
+    start = datetime.combine(date_from, time.min) if date_from else None
+    end = datetime.combine(date_to + timedelta(days=1), time.min) if date_to else None
+    return start, end
+
+REPORT_GRANULARITIES = ('hour', 'day', 'week', 'month')
+
+# SQLite equivalents of date_trunc; weeks start on Monday as in Postgres
+_SQLITE_BUCKETS = {
+    'hour': lambda column: func.strftime('%Y-%m-%d %H:00:00', column),
+    'day': lambda column: func.date(column),
+    'week': lambda column: func.date(column, 'weekday 0', '-6 days'),
+    'month': lambda column: func.strftime('%Y-%m-01', column),
+}
+
+def period_bucket(db, column, granularity: str):
+    """Expresión con el inicio del periodo (hora/día/semana/mes) de column"""
+    if granularity not in REPORT_GRANULARITIES:
+        raise ValueError(f"Invalid granularity: {granularity}")
+    if db.get_bind().dialect.name == 'sqlite':
+        return _SQLITE_BUCKETS[granularity](column)
+    if isinstance(column.type, Date):
+        column = cast(column, DateTime)  # keep date_trunc from going through timestamptz
+    return func.date_trunc(granularity, column)
+
+def weekday_and_hour(db, column):
+    """Expresiones (día de la semana 0=lunes..6=domingo, hora 0..23) de column"""
+    if db.get_bind().dialect.name == 'sqlite':
+        weekday = (cast(func.strftime('%w', column), Integer) + 6) % 7  # %w: 0 = Sunday
+        hour = cast(func.strftime('%H', column), Integer)
+    else:
+        weekday = cast(func.extract('isodow', column), Integer) - 1
+        hour = cast(func.extract('hour', column), Integer)
+    return weekday, hour
+
+def as_datetime(value) -> datetime:
+    """Normaliza el inicio de periodo devuelto por la base de datos"""
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if not isinstance(value, datetime):
+        return datetime.combine(value, time.min)
+    return value
@@ -1,21 +1,53 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, desc, select
 import models.product as models
 import models.supplier as supplier_models
-import models.sale_detail as models_detail
-import models.sale as sale_models
+import models.product_daily_sales as product_sales_models
 import schemas.product_schema as schemas
+from services import metrics_cache, events
+from crud import stock_ledger_crud
 
 
+# Relationships serialized by schemas.Product, loaded in the same query
+PRODUCT_LOAD_OPTIONS = (
+    joinedload(models.Product.category),
+    joinedload(models.Product.supplier),
+)
+
 def get_products(db: Session):
-    return db.query(models.Product).filter(models.Product.is_active == True).all()
+    return db.query(models.Product).options(*PRODUCT_LOAD_OPTIONS).filter(
+        models.Product.is_active == True
+    ).all()
 
 def get_product(db: Session, product_id: int):
-    return db.query(models.Product).filter(
+    return db.query(models.Product).options(*PRODUCT_LOAD_OPTIONS).filter(
         models.Product.id == product_id,
         models.Product.is_active == True
     ).first()
 
+async def get_products_async(db: AsyncSession):
+    result = await db.execute(
+        select(models.Product).options(*PRODUCT_LOAD_OPTIONS).filter(models.Product.is_active == True)
+    )
+    return result.scalars().all()
+
+async def get_product_async(db: AsyncSession, product_id: int):
+    result = await db.execute(
+        select(models.Product).options(*PRODUCT_LOAD_OPTIONS).filter(
+            models.Product.id == product_id,
+            models.Product.is_active == True
+        )
+    )
+    return result.scalars().first()
+
+def _catalog_event(event_type: str, product: models.Product):
+    return {
+        'type': event_type,
+        'product_id': product.id,
+        'low_stock': product.stock <= product.min_stock
+    }
+
 def create_product(db: Session, product: schemas.ProductCreate):
     db_product = models.Product(
         code=product.code,
@@ -28,26 +60,49 @@ def create_product(db: Session, product: schemas.ProductCreate):
         is_active=product.is_active
     )
     db.add(db_product)
+    db.flush()
+    stock_ledger_crud.record_opening_stock(db, [db_product])
     db.commit()
+    metrics_cache.dashboard_metrics.invalidate()
     db.refresh(db_product)
+    if db_product.is_active:
+        events.publish(_catalog_event('product_added', db_product))
     return db_product
 
 def update_product(db: Session, product_id: int, product: schemas.ProductUpdate):
     db_product = db.query(models.Product).filter(models.Product.id == product_id).first()
     if db_product:
         update_data = product.dict(exclude_unset=True)
+        previous_stock, previous_min_stock = db_product.stock, db_product.min_stock
+        was_active = db_product.is_active
+        # Stock edits go through the ledger as an adjustment
+        new_stock = update_data.pop('stock', None)
+        if new_stock is not None and new_stock != previous_stock:
+            stock_ledger_crud.set_stock(db, product_id, new_stock, "Product edit")
         for key, value in update_data.items():
             setattr(db_product, key, value)
+        if bool(db_product.is_active) != bool(was_active):
+            # (De)activation moves the product in or out of the catalog and its low-stock set
+            event = _catalog_event('product_added' if db_product.is_active else 'product_removed', db_product)
+        else:
+            event = events.stock_crossing(db_product, previous_stock, previous_min_stock)
         db.commit()
+        metrics_cache.dashboard_metrics.invalidate()
         db.refresh(db_product)
+        events.publish_all([event])
         return db_product
     return None
 
 def delete_product(db: Session, product_id: int):
     db_product = db.query(models.Product).filter(models.Product.id == product_id).first()
     if db_product:
+        was_active = db_product.is_active
         db_product.is_active = False  # Soft delete
+        removed = _catalog_event('product_removed', db_product)
         db.commit()
+        metrics_cache.dashboard_metrics.invalidate()
+        if was_active:
+            events.publish(removed)
         return db_product
     return None
 
@@ -58,13 +113,11 @@ def update_product_stock(db, product_id, new_stock):
     ).first()
     if not product:
         return None
-    if new_stock is None or new_stock < 0:
-        raise ValueError("Stock debe ser un número positivo")
-    # Aquí podrías agregar el registro de movimiento de inventario si tienes el modelo
-    product.stock = new_stock
-    product.updated_at = datetime.now()
+    crossings = stock_ledger_crud.set_stock(db, product_id, new_stock, "Manual stock update")
     db.commit()
+    metrics_cache.dashboard_metrics.invalidate()
     db.refresh(product)
+    events.publish_all(crossings)
     return product
 
 def get_total_products(db: Session):
@@ -96,31 +149,43 @@ def get_low_stock_items(db: Session):
     ).all()
     return results
 
-def get_products_report(db: Session, start_date=None, end_date=None, category_id=None):
+def _products_report_query(db: Session, start_date=None, end_date=None, category_id=None):
+    rollup = product_sales_models.ProductDailySales
+    sold = db.query(
+        rollup.product_id,
+        func.sum(rollup.quantity).label('total_sold'),
+        func.sum(rollup.revenue).label('total_revenue')
+    )
+    if start_date:
+        sold = sold.filter(rollup.date >= start_date)
+    if end_date:
+        sold = sold.filter(rollup.date <= end_date)
+    sold = sold.group_by(rollup.product_id).subquery()
+    
     query = db.query(
         models.Product.id,
         models.Product.name,
         models.Product.code,
         models.Product.stock,
-        func.coalesce(func.sum(models_detail.SaleDetail.quantity), 0).label('total_sold'),
-        func.coalesce(func.sum(models_detail.SaleDetail.subtotal), 0).label('total_revenue')
-    ).outerjoin(
-        models_detail.SaleDetail, models.Product.id == models_detail.SaleDetail.product_id
+        func.coalesce(sold.c.total_sold, 0).label('total_sold'),
+        func.coalesce(sold.c.total_revenue, 0).label('total_revenue')
     ).outerjoin(
-        sale_models.Sale, models_detail.SaleDetail.sale_id == sale_models.Sale.id
+        sold, sold.c.product_id == models.Product.id
     ).filter(
         models.Product.is_active == True
     )
-    if start_date and end_date:
-        query = query.filter(
-            func.date(sale_models.Sale.fecha) >= start_date,
-            func.date(sale_models.Sale.fecha) <= end_date
-        )
     if category_id:
         query = query.filter(models.Product.category_id == category_id)
-    results = query.group_by(
-        models.Product.id, models.Product.name, models.Product.code, models.Product.stock
-    ).order_by(
-        desc('total_sold')
+    return query
+
+def get_products_report(db: Session, start_date=None, end_date=None, category_id=None):
+    results = _products_report_query(db, start_date, end_date, category_id).order_by(
+        desc('total_sold'), models.Product.id
     ).all()
-    return results
\ No newline at end of file
+    return results
+
+def get_products_sales_rows(db: Session, start_date=None, end_date=None, category_id=None):
+    """Mismas columnas que get_products_report, sin ordenar y como tuplas
+    (sin el costo de las filas del ORM, para catálogos grandes)"""
+    query = _products_report_query(db, start_date, end_date, category_id)
+    return db.execute(query.statement).all()
\ No newline at end of file
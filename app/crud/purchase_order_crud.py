@@ -1,44 +1,61 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import tuple_, func, insert, select
 from datetime import datetime
 from models.purchase_order import PurchaseOrder
 from models.purchase_order_detail import PurchaseOrderDetail
 from models.product import Product
 import schemas.purchase_order_schemas as schemas
+from crud.product_crud import PRODUCT_LOAD_OPTIONS
+from crud import pagination, stock_ledger_crud
 from typing import List
-import random
-import uuid
-
-def generate_order_number(db: Session, prefix: str = "PO"):
-    """Genera un número de orden único"""
-    max_attempts = 10
-    for attempt in range(max_attempts):
-        # Formato: PO-YYYYMMDD-HHMMSS-RRR
-        timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
-        random_suffix = random.randint(100, 999)
-        order_number = f"{prefix}-{timestamp}-{random_suffix}"
-        
-        # Verificar si ya existe
-        existing = db.query(PurchaseOrder).filter(
-            PurchaseOrder.order_number == order_number
-        ).first()
-        
-        if not existing:
-            return order_number
-    
-    # Si después de 10 intentos no encuentra uno único, usar timestamp más específico
-    timestamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')[:-3]  # microsegundos truncados
-    return f"{prefix}-{timestamp}"
+import math
+from services import metrics_cache, events, document_numbers
 
-def get_purchase_orders(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(PurchaseOrder).offset(skip).limit(limit).all()
+# Supplier, lines and line products for schemas.PurchaseOrder
+PURCHASE_ORDER_LOAD_OPTIONS = (
+    joinedload(PurchaseOrder.supplier),
+    selectinload(PurchaseOrder.purchase_order_details)
+    .joinedload(PurchaseOrderDetail.product)
+    .options(*PRODUCT_LOAD_OPTIONS),
+)
+
+def get_purchase_orders(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    status: str = None,
+    cursor: str = None,
+    date_from=None,
+    date_to=None
+):
+    """Órdenes de la más reciente a la más antigua, paginadas por (order_date, id)"""
+    query = db.query(PurchaseOrder).options(*PURCHASE_ORDER_LOAD_OPTIONS)
+    if status:
+        query = query.filter(PurchaseOrder.status == status)
+    start, end = pagination.day_range(date_from, date_to)
+    if start:
+        query = query.filter(PurchaseOrder.order_date >= start)
+    if end:
+        query = query.filter(PurchaseOrder.order_date < end)
+    if cursor:
+        last_date, last_id = pagination.decode_cursor(cursor)
+        query = query.filter(
+            tuple_(PurchaseOrder.order_date, PurchaseOrder.id) < tuple_(last_date, last_id)
+        )
+    query = query.order_by(PurchaseOrder.order_date.desc(), PurchaseOrder.id.desc())
+    if not cursor:
+        query = query.offset(skip)
+    return query.limit(limit).all()
 
 def get_purchase_order(db: Session, order_id: int):
-    return db.query(PurchaseOrder).filter(PurchaseOrder.id == order_id).first()
+    return db.query(PurchaseOrder).options(*PURCHASE_ORDER_LOAD_OPTIONS).filter(
+        PurchaseOrder.id == order_id
+    ).populate_existing().first()
 
-def create_purchase_order(db: Session, order: schemas.PurchaseOrderCreate):
+def create_purchase_order(db: Session, order: schemas.PurchaseOrderCreate, before_commit=None):
     # Calcular total
     total = sum(item.unit_cost * item.quantity_ordered for item in order.items)
-    order_number = generate_order_number(db, "PO")
+    order_number = document_numbers.next_number("PO", db.connection())
     
     db_order = PurchaseOrder(
         order_number=order_number,
@@ -66,9 +83,11 @@ def create_purchase_order(db: Session, order: schemas.PurchaseOrderCreate):
             )
             db.add(db_detail)
         
+        if before_commit:
+            db.flush()
+            before_commit(db, db_order.id)  # e.g. store the idempotent response in this transaction
         db.commit()
-        db.refresh(db_order)
-        return db_order
+        return get_purchase_order(db, db_order.id)
         
     except Exception as e:
         db.rollback()
@@ -98,6 +117,15 @@ def delete_purchase_order(db: Session, order_id: int):
         return True
     return False
 
+# Restock lines are costed at this share of the sale price
+RESTOCK_COST_FACTOR = 0.8
+
+# Orders whose lines still count as stock on the way
+OPEN_ORDER_STATUSES = ('pending', 'in_transit')
+
+# pg_advisory_xact_lock key serializing bulk restocks
+BULK_RESTOCK_LOCK_ID = 240_001
+
 def create_restock_order(db: Session, product_id: int, quantity: int):
     product = db.query(Product).filter(
         Product.id == product_id,
@@ -109,9 +137,9 @@ def create_restock_order(db: Session, product_id: int, quantity: int):
         return None, "Product has no supplier assigned"
     
     # Generar número de orden único
-    order_number = generate_order_number(db, "RST")  # RST = Restock
+    order_number = document_numbers.next_number("RST", db.connection())  # RST = Restock
     
-    total_cost = quantity * product.price * 0.8
+    total_cost = quantity * product.price * RESTOCK_COST_FACTOR
     
     purchase_order = PurchaseOrder(
         order_number=order_number,
@@ -129,7 +157,7 @@ def create_restock_order(db: Session, product_id: int, quantity: int):
         product_id=product_id,
         quantity_ordered=quantity,
         quantity_received=0,
-        unit_cost=product.price * 0.8,
+        unit_cost=product.price * RESTOCK_COST_FACTOR,
         total_cost=total_cost
     )
     db.add(order_detail)
@@ -141,38 +169,154 @@ def create_restock_order(db: Session, product_id: int, quantity: int):
         db.rollback()
         return None, f"Error creating restock order: {str(e)}"
 
+def _receipt_change(order: PurchaseOrder, detail: PurchaseOrderDetail, quantity: int):
+    return stock_ledger_crud.StockChange(
+        product_id=detail.product_id,
+        quantity=quantity,
+        movement_type='purchase',
+        reference_type='purchase_order',
+        reference_id=order.id,
+        notes=f"Received on {order.order_number}"
+    )
+
+def create_bulk_restock_orders(db: Session, target_multiplier: float = 2.0):
+    """Una orden de reposición por proveedor para todos los productos con stock bajo.
+
+    Cada producto se pide hasta min_stock * target_multiplier, descontando
+    lo que ya viene en órdenes abiertas. Órdenes y líneas se insertan en
+    bloque en una sola transacción. Devuelve (órdenes creadas, ids de
+    productos sin proveedor).
+    """
+    if db.get_bind().dialect.name == 'postgresql':
+        # Two runs at once would both miss the other's orders in on_order and
+        # order everything twice; the lock lasts until commit or rollback
+        db.execute(select(func.pg_advisory_xact_lock(BULK_RESTOCK_LOCK_ID)))
+    low_stock = db.query(
+        Product.id,
+        Product.name,
+        Product.price,
+        Product.stock,
+        Product.min_stock,
+        Product.supplier_id
+    ).filter(
+        Product.stock <= Product.min_stock,
+        Product.is_active == True
+    ).order_by(Product.supplier_id, Product.id).all()
+    without_supplier = [product.id for product in low_stock if not product.supplier_id]
+    low_stock = [product for product in low_stock if product.supplier_id]
+    if not low_stock:
+        return [], without_supplier
+
+    on_order = dict(db.query(
+        PurchaseOrderDetail.product_id,
+        func.sum(PurchaseOrderDetail.quantity_ordered - func.coalesce(PurchaseOrderDetail.quantity_received, 0))
+    ).join(PurchaseOrder).filter(
+        PurchaseOrder.status.in_(OPEN_ORDER_STATUSES),
+        PurchaseOrderDetail.product_id.in_([product.id for product in low_stock])
+    ).group_by(PurchaseOrderDetail.product_id).all())
+
+    lines_by_supplier = {}
+    for product in low_stock:
+        target = math.ceil(max(product.min_stock, 1) * target_multiplier)
+        quantity = target - product.stock - max(on_order.get(product.id) or 0, 0)
+        if quantity <= 0:
+            continue
+        unit_cost = product.price * RESTOCK_COST_FACTOR
+        lines_by_supplier.setdefault(product.supplier_id, []).append({
+            'product_id': product.id,
+            'quantity_ordered': quantity,
+            'quantity_received': 0,
+            'unit_cost': unit_cost,
+            'total_cost': unit_cost * quantity
+        })
+    if not lines_by_supplier:
+        return [], without_supplier
+
+    try:
+        now = datetime.now()
+        supplier_ids = list(lines_by_supplier)
+        order_numbers = document_numbers.next_numbers("RST", len(supplier_ids), db.connection())
+        orders = [
+            {
+                'order_number': order_number,
+                'supplier_id': supplier_id,
+                'status': 'pending',
+                'total_amount': sum(line['total_cost'] for line in lines_by_supplier[supplier_id]),
+                'order_date': now,
+                'notes': f"Bulk restock of {len(lines_by_supplier[supplier_id])} low-stock products"
+            }
+            for supplier_id, order_number in zip(supplier_ids, order_numbers)
+        ]
+        order_ids = db.execute(
+            insert(PurchaseOrder).returning(PurchaseOrder.id, sort_by_parameter_order=True),
+            orders
+        ).scalars().all()
+        db.execute(insert(PurchaseOrderDetail), [
+            dict(line, purchase_order_id=order_id)
+            for order_id, supplier_id in zip(order_ids, supplier_ids)
+            for line in lines_by_supplier[supplier_id]
+        ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return [
+        {
+            'order_id': order_id,
+            'order_number': order['order_number'],
+            'supplier_id': order['supplier_id'],
+            'lines': len(lines_by_supplier[order['supplier_id']]),
+            'total_amount': order['total_amount']
+        }
+        for order_id, order in zip(order_ids, orders)
+    ], without_supplier
+
+def _lock_order(db: Session, order_id: int):
+    """Bloquea la orden y sus líneas (en orden de id) hasta el commit, para que
+    dos recepciones simultáneas no sumen dos veces lo mismo"""
+    order = db.query(PurchaseOrder).filter(
+        PurchaseOrder.id == order_id
+    ).with_for_update().populate_existing().first()
+    if not order:
+        return None, []
+    details = db.query(PurchaseOrderDetail).filter(
+        PurchaseOrderDetail.purchase_order_id == order_id
+    ).order_by(PurchaseOrderDetail.id).with_for_update().populate_existing().all()
+    return order, details
+
 def receive_order_items(db: Session, order_id: int, items_data: dict):
-    order = db.query(PurchaseOrder).filter(PurchaseOrder.id == order_id).first()
+    order, details = _lock_order(db, order_id)
     if not order:
         return None, "Order not found"
     try:
+        details_by_id = {detail.id: detail for detail in details}
+        stock_changes = []
         items = items_data.get('items', [])
         for item in items:
             detail_id = item.get('detail_id')
             quantity_received = item.get('quantity_received', 0)
             if quantity_received <= 0:
                 continue
-            detail = db.query(PurchaseOrderDetail).filter(
-                PurchaseOrderDetail.id == detail_id,
-                PurchaseOrderDetail.purchase_order_id == order_id
-            ).first()
+            detail = details_by_id.get(detail_id)
             if not detail:
                 continue
-            detail.quantity_received += quantity_received
-            if detail.quantity_received > detail.quantity_ordered:
-                detail.quantity_received = detail.quantity_ordered
-            product = db.query(Product).filter(Product.id == detail.product_id).first()
-            if product:
-                product.stock += quantity_received
-                product.updated_at = datetime.now()
+            # Stock grows only by what the line still expected
+            received = min(quantity_received, detail.quantity_ordered - detail.quantity_received)
+            if received <= 0:
+                continue
+            detail.quantity_received += received
+            stock_changes.append(_receipt_change(order, detail, received))
+        crossings = stock_ledger_crud.apply_changes(db, stock_changes)
         all_received = all(
             detail.quantity_received >= detail.quantity_ordered
-            for detail in order.purchase_order_details
+            for detail in details
         )
         if all_received:
             order.status = 'delivered'
             order.received_date = datetime.now()
         db.commit()
+        metrics_cache.dashboard_metrics.invalidate()
+        events.publish_all(crossings)
         db.refresh(order)
         return order, None
     except Exception as e:
@@ -180,23 +324,28 @@ def receive_order_items(db: Session, order_id: int, items_data: dict):
         return None, f"Error receiving items: {str(e)}"
 
 def receive_purchase_order(db: Session, order_id: int):
-    order = db.query(PurchaseOrder).filter(PurchaseOrder.id == order_id).first()
+    order, details = _lock_order(db, order_id)
     if not order:
         return None, "Order not found"
     if order.status == 'delivered':
+        db.rollback()
         return None, "Order already received"
     try:
         order.status = 'delivered'
         order.received_date = datetime.now()
-        for detail in order.purchase_order_details:
-            product = db.query(Product).filter(Product.id == detail.product_id).first()
-            if product:
+        stock_changes = []
+        for detail in details:
+            # Lines partially received before only add what was missing
+            outstanding = detail.quantity_ordered - (detail.quantity_received or 0)
+            if outstanding > 0:
                 detail.quantity_received = detail.quantity_ordered
-                product.stock += detail.quantity_ordered
-                product.updated_at = datetime.now()
+                stock_changes.append(_receipt_change(order, detail, outstanding))
+        crossings = stock_ledger_crud.apply_changes(db, stock_changes)
         db.commit()
+        metrics_cache.dashboard_metrics.invalidate()
+        events.publish_all(crossings)
         db.refresh(order)
         return order, None
     except Exception as e:
         db.rollback()
-        return None, f"Error receiving order: {str(e)}"
\ No newline at end of file
+        return None, f"Error receiving order: {str(e)}"
@@ -1,35 +1,50 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 import models.purchase_order_detail as models
 import schemas.purchase_order_detail_schema as schemas
-from models.product import Product
-import datetime
+from crud.product_crud import PRODUCT_LOAD_OPTIONS
+from crud import stock_ledger_crud
+from services import metrics_cache, events
+
+DETAIL_LOAD_OPTIONS = (
+    joinedload(models.PurchaseOrderDetail.product).options(*PRODUCT_LOAD_OPTIONS),
+)
 
 def get_order_details(db: Session, order_id: int):
-    return db.query(models.PurchaseOrderDetail).filter(
+    return db.query(models.PurchaseOrderDetail).options(*DETAIL_LOAD_OPTIONS).filter(
         models.PurchaseOrderDetail.purchase_order_id == order_id
     ).all()
 
 def get_order_detail(db: Session, detail_id: int):
-    return db.query(models.PurchaseOrderDetail).filter(
+    return db.query(models.PurchaseOrderDetail).options(*DETAIL_LOAD_OPTIONS).filter(
         models.PurchaseOrderDetail.id == detail_id
     ).first()
     
+def _receipt_change(detail: models.PurchaseOrderDetail, quantity: int):
+    return stock_ledger_crud.StockChange(
+        product_id=detail.product_id,
+        quantity=quantity,
+        movement_type='purchase',
+        reference_type='purchase_order',
+        reference_id=detail.purchase_order_id,
+        notes=f"Received on purchase order detail #{detail.id}"
+    )
+
 def receive_order_detail_items(db: Session, detail_id: int, quantity: int):
     if quantity <= 0:
         return None, "Quantity must be positive"
+    # Locked until commit so concurrent receipts see each other's quantity
     detail = db.query(models.PurchaseOrderDetail).filter(
         models.PurchaseOrderDetail.id == detail_id
-    ).first()
+    ).with_for_update().populate_existing().first()
     if not detail:
         return None, f"Order detail with id {detail_id} not found"
-    detail.quantity_received += quantity
-    if detail.quantity_received > detail.quantity_ordered:
-        detail.quantity_received = detail.quantity_ordered
-    product = db.query(Product).filter(Product.id == detail.product_id).first()
-    if product:
-        product.stock += quantity
-        product.updated_at = datetime.now()
+    # Stock grows only by what the line still expected
+    received = max(min(quantity, detail.quantity_ordered - detail.quantity_received), 0)
+    detail.quantity_received += received
+    crossings = stock_ledger_crud.apply_changes(db, [_receipt_change(detail, received)])
     db.commit()
+    metrics_cache.dashboard_metrics.invalidate()
+    events.publish_all(crossings)
     db.refresh(detail)
     return detail, None
 
@@ -40,20 +55,16 @@ def update_received_quantity(
 ):
     db_detail = db.query(models.PurchaseOrderDetail).filter(
         models.PurchaseOrderDetail.id == detail_id
-    ).first()
+    ).with_for_update().populate_existing().first()
     if db_detail:
+        # Actualizar stock del producto con la diferencia recibida
+        delta = quantity_received - (db_detail.quantity_received or 0)
         db_detail.quantity_received = quantity_received
         db_detail.total_cost = db_detail.unit_cost * quantity_received
+        crossings = stock_ledger_crud.apply_changes(db, [_receipt_change(db_detail, delta)])
         db.commit()
+        metrics_cache.dashboard_metrics.invalidate()
+        events.publish_all(crossings)
         db.refresh(db_detail)
-        
-        # Actualizar stock del producto
-        product = db.query(models.Product).filter(
-            models.Product.id == db_detail.product_id
-        ).first()
-        if product:
-            product.stock += (quantity_received - db_detail.quantity_received)
-            db.commit()
-        
         return db_detail
-    return None
\ No newline at end of file
+    return None
@@ -0,0 +1,115 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
+import json
+import uuid
+from models.report_job import ReportJob
+from models.sale import Sale
+from models.daily_summary import DailySummary
+from models.inventory_movement import InventoryMovement
+from models.product import Product
+from crud import idempotency_crud
+from services import analytics
+import config
+
+# Seconds a new job may be queued before this process has submitted it
+SUBMIT_GRACE_SECONDS = 5
+
+def get_data_version(db: Session, source: str = 'db') -> str:
+    """Marca que cambia con cada venta nueva o eliminada y con cada cambio
+    de stock o de producto (los reportes muestran el stock actual).
+
+    Los reportes con source='analytics' leen el snapshot Parquet: su marca
+    es el momento del snapshot y no depende de las escrituras en la base.
+    """
+    if source == 'analytics':
+        return idempotency_crud.hash_request(['analytics', analytics.snapshot_time()])
+    last_sale_id, last_summary_update, last_movement_id, last_product_update = db.query(
+        select(func.max(Sale.id)).scalar_subquery(),
+        # Checkout and deletions bump the day's summary updated_at
+        select(func.max(DailySummary.updated_at)).scalar_subquery(),
+        select(func.max(InventoryMovement.id)).scalar_subquery(),
+        select(func.max(Product.updated_at)).scalar_subquery()
+    ).one()
+    # Hashed to fit report_jobs.sales_version
+    return idempotency_crud.hash_request(
+        [last_sale_id, last_summary_update, last_movement_id, last_product_update]
+    )
+
+def _is_abandoned(job: ReportJob, is_pending) -> bool:
+    now = datetime.utcnow()
+    if job.status == 'running':
+        # Running far past the statement timeout: its worker is gone
+        limit = now - timedelta(seconds=config.REPORT_JOB_STATEMENT_TIMEOUT_SECONDS + 60)
+        return (job.started_at or job.created_at) < limit
+    if job.status == 'queued':
+        # Queued jobs wait in the executor of the process that created them;
+        # one this process has no future for (e.g. queued before a restart)
+        # never starts
+        grace = now - timedelta(seconds=SUBMIT_GRACE_SECONDS)
+        return not is_pending(job.id) and job.created_at < grace
+    return False
+
+def get_or_create_job(db: Session, report: str, params: dict, is_pending):
+    """Devuelve (job, creado). Reutiliza un job con los mismos parámetros
+    mientras no cambien los datos, salvo que haya fallado o se haya perdido.
+
+    is_pending(job_id) dice si el job sigue en la cola de este proceso.
+    """
+    params_key = idempotency_crud.hash_request({'report': report, 'params': params})
+    sales_version = get_data_version(db, params.get('source'))
+    existing = db.query(ReportJob).filter(
+        ReportJob.params_key == params_key,
+        ReportJob.sales_version == sales_version
+    ).first()
+    if existing and existing.status != 'failed' and not _is_abandoned(existing, is_pending):
+        return existing, False
+    
+    # Drop finished results for these parameters computed from older sales
+    db.query(ReportJob).filter(
+        ReportJob.params_key == params_key,
+        ReportJob.status.in_(('done', 'failed'))
+    ).delete(synchronize_session=False)
+    if existing:
+        db.delete(existing)
+        db.flush()  # the new job reuses its (params_key, sales_version)
+    job = ReportJob(
+        id=uuid.uuid4().hex,
+        report=report,
+        params=json.dumps(params, default=str),
+        params_key=params_key,
+        sales_version=sales_version,
+        status='queued'
+    )
+    db.add(job)
+    try:
+        db.commit()
+        return job, True
+    except IntegrityError:
+        # Same request queued concurrently
+        db.rollback()
+        return db.query(ReportJob).filter(
+            ReportJob.params_key == params_key,
+            ReportJob.sales_version == sales_version
+        ).first(), False
+
+def get_job(db: Session, job_id: str):
+    return db.query(ReportJob).filter(ReportJob.id == job_id).first()
+
+def _update_job(db: Session, job_id: str, values: dict):
+    db.query(ReportJob).filter(ReportJob.id == job_id).update(values, synchronize_session=False)
+    db.commit()
+
+def mark_running(db: Session, job_id: str):
+    _update_job(db, job_id, {'status': 'running', 'started_at': datetime.utcnow()})
+
+def mark_done(db: Session, job_id: str, result):
+    _update_job(db, job_id, {
+        'status': 'done',
+        'result': json.dumps(result, default=str),
+        'finished_at': datetime.utcnow()
+    })
+
+def mark_failed(db: Session, job_id: str, error: str):
+    _update_job(db, job_id, {'status': 'failed', 'error': error, 'finished_at': datetime.utcnow()})
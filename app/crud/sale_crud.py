@@ -1,110 +1,241 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func, desc, insert, select, tuple_
 import models.sale as sale_models
 import models.product as product_models
 import models.sale_detail as sale_detail_models
-import models.inventory_movement as inventory_models
+import models.product_daily_sales as product_sales_models
 import schemas.sale_schema as schemas
+from crud.product_crud import PRODUCT_LOAD_OPTIONS
+from crud import pagination, daily_summary_crud, stock_ledger_crud
 from datetime import datetime
 from typing import List
 from fastapi import HTTPException, status
+from services import metrics_cache, events, document_numbers
 
-def get_sales(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(sale_models.Sale).offset(skip).limit(limit).all()
+# Lines and their products for schemas.Sale, one extra query per page
+SALE_LOAD_OPTIONS = (
+    selectinload(sale_models.Sale.sale_details)
+    .joinedload(sale_detail_models.SaleDetail.product)
+    .options(*PRODUCT_LOAD_OPTIONS),
+)
+
+def get_sales(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str = None,
+    date_from=None,
+    date_to=None,
+    payment_method: str = None
+):
+    """Ventas de la más reciente a la más antigua, paginadas por (fecha, id)"""
+    query = db.query(sale_models.Sale).options(*SALE_LOAD_OPTIONS)
+    start, end = pagination.day_range(date_from, date_to)
+    if start:
+        query = query.filter(sale_models.Sale.fecha >= start)
+    if end:
+        query = query.filter(sale_models.Sale.fecha < end)
+    if payment_method:
+        query = query.filter(sale_models.Sale.payment_method == payment_method)
+    if cursor:
+        last_fecha, last_id = pagination.decode_cursor(cursor)
+        query = query.filter(
+            tuple_(sale_models.Sale.fecha, sale_models.Sale.id) < tuple_(last_fecha, last_id)
+        )
+    query = query.order_by(sale_models.Sale.fecha.desc(), sale_models.Sale.id.desc())
+    if not cursor:
+        query = query.offset(skip)
+    return query.limit(limit).all()
+
+EXPORT_COLUMNS = (
+    'sale_id', 'fecha', 'payment_method', 'customer_name', 'tax_amount',
+    'discount_amount', 'total', 'detail_id', 'product_id', 'product_code',
+    'product_name', 'quantity', 'unit_price', 'subtotal'
+)
+
+def iter_sale_lines(db: Session, date_from=None, date_to=None, batch_size: int = 1000):
+    """Recorre ventas y sus líneas aplanadas con un cursor del servidor"""
+    query = db.query(
+        sale_models.Sale.id,
+        sale_models.Sale.fecha,
+        sale_models.Sale.payment_method,
+        sale_models.Sale.customer_name,
+        sale_models.Sale.tax_amount,
+        sale_models.Sale.discount_amount,
+        sale_models.Sale.total,
+        sale_detail_models.SaleDetail.id,
+        sale_detail_models.SaleDetail.product_id,
+        product_models.Product.code,
+        product_models.Product.name,
+        sale_detail_models.SaleDetail.quantity,
+        sale_detail_models.SaleDetail.unit_price,
+        sale_detail_models.SaleDetail.subtotal
+    ).outerjoin(
+        sale_detail_models.SaleDetail, sale_models.Sale.id == sale_detail_models.SaleDetail.sale_id
+    ).outerjoin(
+        product_models.Product, sale_detail_models.SaleDetail.product_id == product_models.Product.id
+    )
+    start, end = pagination.day_range(date_from, date_to)
+    if start:
+        query = query.filter(sale_models.Sale.fecha >= start)
+    if end:
+        query = query.filter(sale_models.Sale.fecha < end)
+    return query.order_by(
+        sale_models.Sale.fecha, sale_models.Sale.id, sale_detail_models.SaleDetail.id
+    ).yield_per(batch_size)
 
 def get_sale(db: Session, sale_id: int):
-    return db.query(sale_models.Sale).filter(sale_models.Sale.id == sale_id).first()
+    return db.query(sale_models.Sale).options(*SALE_LOAD_OPTIONS).filter(
+        sale_models.Sale.id == sale_id
+    ).populate_existing().first()
 
-def create_sale_with_details(db: Session, sale: schemas.SaleCreate):
-    try:
-        # Validate products and stock first
-        total_amount = 0
-        sale_items = []
+def _validate_sale_items(sale: schemas.SaleCreate, products: dict, remaining_stock: dict):
+    """Valida las líneas de una venta contra el stock restante.
+
+    Solo descuenta de remaining_stock si todas las líneas son válidas.
+    """
+    total_amount = 0
+    sale_items = []
+    reserved = {}
+    failed_items = []
+    
+    for line, item in enumerate(sale.items):
+        product = products.get(item.product_id)
+        
+        if not product:
+            failed_items.append({
+                'line': line,
+                'product_id': item.product_id,
+                'error': f"Product with id {item.product_id} not found or inactive"
+            })
+            continue
         
-        for item in sale.items:
-            # Get product and validate
-            product = db.query(product_models.Product).filter(
-                product_models.Product.id == item.product_id,
-                product_models.Product.is_active == True
-            ).first()
-            
-            if not product:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Product with id {item.product_id} not found or inactive"
-                )
-            
-            # Check stock availability
-            if product.stock < item.quantity:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Insufficient stock for product {product.name}. Available: {product.stock}, Requested: {item.quantity}"
-                )
-            
-            subtotal = item.unit_price * item.quantity
-            total_amount += subtotal
-            sale_items.append({
-                'product': product,
-                'item': item,
-                'subtotal': subtotal
+        # Check stock availability (repeated lines share the same stock)
+        available = reserved.get(product.id, remaining_stock.get(product.id, product.stock))
+        if available < item.quantity:
+            failed_items.append({
+                'line': line,
+                'product_id': item.product_id,
+                'available': available,
+                'requested': item.quantity,
+                'error': f"Insufficient stock for product {product.name}. Available: {available}, Requested: {item.quantity}"
             })
+            continue
+        reserved[product.id] = available - item.quantity
         
-        # Calculate final total with tax and discount
-        final_total = total_amount + sale.tax_amount - sale.discount_amount
+        subtotal = item.unit_price * item.quantity
+        total_amount += subtotal
+        sale_items.append({
+            'item': item,
+            'subtotal': subtotal
+        })
+    
+    if not failed_items:
+        remaining_stock.update(reserved)
+    
+    # Calculate final total with tax and discount
+    final_total = total_amount + sale.tax_amount - sale.discount_amount
+    return sale_items, final_total, failed_items
+
+def _sale_line_rows(sale_id: int, sale_items: list, moment: datetime):
+    details = []
+    stock_changes = []
+    for sale_item in sale_items:
+        item = sale_item['item']
+        details.append({
+            'sale_id': sale_id,
+            'product_id': item.product_id,
+            'quantity': item.quantity,
+            'unit_price': item.unit_price,
+            'subtotal': sale_item['subtotal']
+        })
+        stock_changes.append(stock_ledger_crud.StockChange(
+            product_id=item.product_id,
+            quantity=-item.quantity,
+            movement_type='sale',
+            reference_type='sale',
+            reference_id=sale_id,
+            notes=f"Sale #{sale_id}",
+            movement_date=moment
+        ))
+    return details, stock_changes
+
+def _summary_entry(moment: datetime, total: float, sale_items: list):
+    quantity = sum(sale_item['item'].quantity for sale_item in sale_items)
+    return moment, total, quantity, len(sale_items)
+
+def _product_entries(moment: datetime, sale_items: list):
+    return [
+        (moment, sale_item['item'].product_id, sale_item['item'].quantity, sale_item['subtotal'])
+        for sale_item in sale_items
+    ]
+
+def _sale_event(sale_id: int, moment: datetime, total: float, sale_items: list):
+    return {
+        'type': 'sale',
+        'sale_id': sale_id,
+        'fecha': moment.isoformat(),
+        'total': total,
+        'items': sum(sale_item['item'].quantity for sale_item in sale_items)
+    }
+
+def create_sale_with_details(db: Session, sale: schemas.SaleCreate, before_commit=None):
+    try:
+        # Summary lock before product locks, in the same order as the rebuilds
+        daily_summary_crud.lock_summaries(db)
+        products = stock_ledger_crud.lock_products(db, {item.product_id for item in sale.items}, active_only=True)
+        
+        # Validate products and stock first
+        remaining_stock = {}
+        sale_items, final_total, failed_items = _validate_sale_items(sale, products, remaining_stock)
+        
+        if failed_items:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={
+                    'message': failed_items[0]['error'],
+                    'failed_items': failed_items
+                }
+            )
         
         # Create sale record
+        now = datetime.now()
         db_sale = sale_models.Sale(
+            receipt_number=document_numbers.next_number("REC", db.connection()),
             payment_method=sale.payment_method,
             customer_name=sale.customer_name,
             notes=sale.notes,
             tax_amount=sale.tax_amount,
             discount_amount=sale.discount_amount,
             total=final_total,
-            fecha=datetime.now()
+            fecha=now
         )
         
         db.add(db_sale)
         db.flush()  # Get the sale ID without committing
         
-        # Create sale details and update stock
-        for sale_item in sale_items:
-            product = sale_item['product']
-            item = sale_item['item']
-            subtotal = sale_item['subtotal']
-            
-            # Create sale detail
-            db_detail = sale_detail_models.SaleDetail(
-                sale_id=db_sale.id,
-                product_id=item.product_id,
-                quantity=item.quantity,
-                unit_price=item.unit_price,
-                subtotal=subtotal
-            )
-            db.add(db_detail)
-            
-            # Update product stock
-            previous_stock = product.stock
-            product.stock -= item.quantity
-            
-            # Create inventory movement record (if you have this model)
-            movement = inventory_models.InventoryMovement(
-                product_id=item.product_id,
-                movement_type='sale',
-                quantity=-item.quantity,
-                reference_type='sale',
-                reference_id=db_sale.id,
-                movement_date=datetime.now(),
-                notes=f"Sale #{db_sale.id}",
-                previous_stock=previous_stock,
-                new_stock=product.stock
-            )
-            db.add(movement)
+        # Create sale details as a multi-row insert; the ledger updates
+        # stock and inserts the inventory movements the same way
+        details, stock_changes = _sale_line_rows(db_sale.id, sale_items, now)
+        if details:  # an empty list would run INSERT ... DEFAULT VALUES
+            db.execute(insert(sale_detail_models.SaleDetail), details)
+        crossings = stock_ledger_crud.apply_changes(db, stock_changes, products, now)
+        
+        # Roll the sale into today's summary last, to hold its row lock briefly
+        db.flush()
+        daily_summary_crud.record_product_sales(db, _product_entries(now, sale_items))
+        daily_summary_crud.record_sales(db, [_summary_entry(now, final_total, sale_items)])
+        if before_commit:
+            before_commit(db, db_sale.id)  # e.g. store the idempotent response in this transaction
         
         # Commit all changes
         db.commit()
-        db.refresh(db_sale)
+        metrics_cache.dashboard_metrics.invalidate()
+        metrics_cache.sales_heatmap.invalidate()
+        metrics_cache.abc_report.invalidate()
+        events.publish_all([_sale_event(db_sale.id, now, final_total, sale_items)] + crossings)
         
-        return db_sale
+        return get_sale(db, db_sale.id)
         
     except HTTPException:
         db.rollback()
@@ -116,12 +247,113 @@ def create_sale_with_details(db: Session, sale: schemas.SaleCreate):
             detail=f"Error creating sale: {str(e)}"
         )
 
+def _create_sales_chunk(db: Session, chunk: list):
+    """Inserta un bloque de ventas en una sola transacción.
+
+    Las ventas que no pasan la validación se reportan como fallidas sin
+    afectar al resto del bloque.
+    """
+    daily_summary_crud.lock_summaries(db)
+    products = stock_ledger_crud.lock_products(db, {
+        item.product_id for _, sale in chunk for item in sale.items
+    }, active_only=True)
+    remaining_stock = {}
+    results = []
+    accepted = []
+    published = []
+    now = datetime.now()
+    
+    for index, sale in chunk:
+        sale_items, final_total, failed_items = _validate_sale_items(sale, products, remaining_stock)
+        if failed_items:
+            results.append({'index': index, 'status': 'failed', 'failed_items': failed_items})
+            continue
+        accepted.append((index, sale, sale_items, final_total))
+    
+    if accepted:
+        receipt_numbers = document_numbers.next_numbers("REC", len(accepted), db.connection())
+        sale_ids = db.execute(
+            insert(sale_models.Sale).returning(sale_models.Sale.id, sort_by_parameter_order=True),
+            [
+                {
+                    'receipt_number': receipt_number,
+                    'payment_method': sale.payment_method,
+                    'customer_name': sale.customer_name,
+                    'notes': sale.notes,
+                    'tax_amount': sale.tax_amount,
+                    'discount_amount': sale.discount_amount,
+                    'total': final_total,
+                    'fecha': sale.fecha or now
+                }
+                for receipt_number, (_, sale, _, final_total) in zip(receipt_numbers, accepted)
+            ]
+        ).scalars().all()
+        
+        details = []
+        stock_changes = []
+        for sale_id, receipt_number, (index, sale, sale_items, final_total) in zip(sale_ids, receipt_numbers, accepted):
+            sale_details, sale_stock_changes = _sale_line_rows(sale_id, sale_items, sale.fecha or now)
+            details.extend(sale_details)
+            stock_changes.extend(sale_stock_changes)
+            results.append({
+                'index': index,
+                'status': 'created',
+                'sale_id': sale_id,
+                'receipt_number': receipt_number,
+                'total': final_total
+            })
+            published.append(_sale_event(sale_id, sale.fecha or now, final_total, sale_items))
+        if details:
+            db.execute(insert(sale_detail_models.SaleDetail), details)
+        published.extend(stock_ledger_crud.apply_changes(db, stock_changes, products, now))
+        
+        db.flush()
+        daily_summary_crud.record_product_sales(db, [
+            entry
+            for _, sale, sale_items, _ in accepted
+            for entry in _product_entries(sale.fecha or now, sale_items)
+        ])
+        daily_summary_crud.record_sales(db, [
+            _summary_entry(sale.fecha or now, final_total, sale_items)
+            for _, sale, sale_items, final_total in accepted
+        ])
+    
+    db.commit()
+    metrics_cache.dashboard_metrics.invalidate()
+    metrics_cache.sales_heatmap.invalidate()
+    metrics_cache.abc_report.invalidate()
+    events.publish_all(published)
+    return results
+
+def create_sales_batch(db: Session, sales: List[schemas.OfflineSaleCreate], chunk_size: int = 500):
+    """Registra ventas en bloque (p. ej. reenviadas por terminales sin conexión).
+
+    Cada bloque de chunk_size ventas se confirma por separado, así un error
+    en un bloque no deshace los anteriores.
+    """
+    results = []
+    indexed = list(enumerate(sales))
+    for start in range(0, len(indexed), chunk_size):
+        chunk = indexed[start:start + chunk_size]
+        try:
+            results.extend(_create_sales_chunk(db, chunk))
+        except Exception as e:
+            db.rollback()
+            results.extend(
+                {'index': index, 'status': 'failed', 'error': f"Error creating sale: {str(e)}"}
+                for index, _ in chunk
+            )
+    results.sort(key=lambda result: result['index'])
+    return results
+
 def update_sale(db: Session, sale_id: int, sale: schemas.SaleBase):
     db_sale = db.query(sale_models.Sale).filter(sale_models.Sale.id == sale_id).first()
     if db_sale:
         for key, value in sale.dict(exclude_unset=True).items():
             setattr(db_sale, key, value)
         db.commit()
+        metrics_cache.sales_heatmap.invalidate()
+        metrics_cache.abc_report.invalidate()
         db.refresh(db_sale)
         return db_sale
     return None
@@ -130,56 +362,143 @@ def delete_sale(db: Session, sale_id: int):
     db_sale = db.query(sale_models.Sale).filter(sale_models.Sale.id == sale_id).first()
     if db_sale:
         # Note: In a real system, you should reverse stock changes
+        quantity = sum(detail.quantity for detail in db_sale.sale_details)
+        daily_summary_crud.record_sales(db, [(
+            db_sale.fecha,
+            db_sale.total,
+            quantity,
+            len(db_sale.sale_details)
+        )], sign=-1)
+        daily_summary_crud.record_product_sales(db, [
+            (db_sale.fecha, detail.product_id, detail.quantity, detail.subtotal)
+            for detail in db_sale.sale_details
+        ], sign=-1)
+        deleted = {
+            'type': 'sale_deleted',
+            'sale_id': db_sale.id,
+            'fecha': db_sale.fecha.isoformat(),
+            'total': db_sale.total,
+            'items': quantity
+        }
         db.delete(db_sale)
         db.commit()
+        metrics_cache.dashboard_metrics.invalidate()
+        metrics_cache.sales_heatmap.invalidate()
+        metrics_cache.abc_report.invalidate()
+        events.publish(deleted)
         return True
     return False
 
 def get_daily_sales_count(db: Session, today):
-    return db.query(func.count(sale_models.Sale.id)).filter(
-        func.date(sale_models.Sale.fecha) == today
-    ).scalar() or 0
+    summary = daily_summary_crud.get_daily_summary(db, today)
+    return summary.total_sales if summary else 0
 
 def get_daily_revenue(db: Session, today):
-    return db.query(func.sum(sale_models.Sale.total)).filter(
-        func.date(sale_models.Sale.fecha) == today
-    ).scalar() or 0.0
+    summary = daily_summary_crud.get_daily_summary(db, today)
+    return summary.total_revenue if summary else 0.0
 
-def get_best_selling_products(db: Session, since_date, limit=10):
-    results = db.query(
+def get_best_selling_products(db: Session, since_date, limit=10, category_id=None):
+    rollup = product_sales_models.ProductDailySales
+    query = db.query(
         product_models.Product.id,
         product_models.Product.name,
         product_models.Product.code,
-        func.sum(sale_detail_models.SaleDetail.quantity).label('total_sold'),
-        func.sum(sale_detail_models.SaleDetail.subtotal).label('total_revenue')
-    ).join(
-        sale_detail_models.SaleDetail, product_models.Product.id == sale_detail_models.SaleDetail.product_id
+        func.sum(rollup.quantity).label('total_sold'),
+        func.sum(rollup.revenue).label('total_revenue')
     ).join(
-        sale_models.Sale, sale_detail_models.SaleDetail.sale_id == sale_models.Sale.id
+        rollup, product_models.Product.id == rollup.product_id
     ).filter(
-        sale_models.Sale.fecha >= since_date,
+        rollup.date >= since_date,
         product_models.Product.is_active == True
-    ).group_by(
+    )
+    if category_id:
+        query = query.filter(product_models.Product.category_id == category_id)
+    results = query.group_by(
         product_models.Product.id, product_models.Product.name, product_models.Product.code
+    ).having(
+        func.sum(rollup.quantity) > 0
     ).order_by(
         desc('total_sold')
     ).limit(limit).all()
     return results
 
-def get_sales_report(db: Session, start_date, end_date):
-    results = db.query(
-        func.date(sale_models.Sale.fecha).label('date'),
-        func.count(sale_models.Sale.id).label('total_sales'),
-        func.sum(sale_models.Sale.total).label('total_revenue'),
-        func.sum(sale_detail_models.SaleDetail.quantity).label('total_products_sold')
+def build_sales_report(db: Session, start_date, end_date, granularity: str = 'day'):
+    """Totales de ventas por periodo calculados desde sales y sale_details.
+
+    Ventas y líneas se agregan en subconsultas separadas y solo se unen los
+    totales de cada periodo, así cada venta cuenta una sola vez.
+    """
+    start, end = pagination.day_range(start_date, end_date)
+    Sale = sale_models.Sale
+    SaleDetail = sale_detail_models.SaleDetail
+    period = pagination.period_bucket(db, Sale.fecha, granularity)
+    
+    sales_per_period = select(
+        period.label('period'),
+        func.count(Sale.id).label('total_sales'),
+        func.sum(Sale.total).label('total_revenue')
+    ).where(
+        Sale.fecha >= start,
+        Sale.fecha < end
+    ).group_by(period).subquery()
+    lines_per_period = select(
+        period.label('period'),
+        func.sum(SaleDetail.quantity).label('total_products_sold')
     ).join(
-        sale_detail_models.SaleDetail, sale_models.Sale.id == sale_detail_models.SaleDetail.sale_id
-    ).filter(
-        func.date(sale_models.Sale.fecha) >= start_date,
-        func.date(sale_models.Sale.fecha) <= end_date
-    ).group_by(
-        func.date(sale_models.Sale.fecha)
-    ).order_by(
-        desc('date')
+        SaleDetail, SaleDetail.sale_id == Sale.id
+    ).where(
+        Sale.fecha >= start,
+        Sale.fecha < end
+    ).group_by(period).subquery()
+    
+    return db.execute(
+        select(
+            sales_per_period.c.period,
+            sales_per_period.c.total_sales,
+            sales_per_period.c.total_revenue,
+            func.coalesce(lines_per_period.c.total_products_sold, 0).label('total_products_sold')
+        ).outerjoin(
+            lines_per_period, lines_per_period.c.period == sales_per_period.c.period
+        ).order_by(sales_per_period.c.period.desc())
     ).all()
-    return results
\ No newline at end of file
+
+def get_sales_report(db: Session, start_date, end_date, granularity: str = 'day'):
+    # Hours need the raw rows; days and up are sums of the daily rollup
+    if granularity == 'hour':
+        return build_sales_report(db, start_date, end_date, granularity)
+    return daily_summary_crud.get_summary_periods(db, start_date, end_date, granularity)
+
+def get_sales_heatmap(db: Session, start_date, end_date, category_id=None):
+    """Ventas e ingresos por (día de la semana, hora) en una sola consulta agrupada.
+
+    Con category_id cuenta las ventas con alguna línea de esa categoría y
+    suma solo el subtotal de esas líneas.
+    """
+    start, end = pagination.day_range(start_date, end_date)
+    Sale = sale_models.Sale
+    weekday, hour = pagination.weekday_and_hour(db, Sale.fecha)
+    if category_id is None:
+        query = db.query(
+            weekday.label('weekday'),
+            hour.label('hour'),
+            func.count(Sale.id).label('total_sales'),
+            func.sum(Sale.total).label('total_revenue')
+        )
+    else:
+        SaleDetail = sale_detail_models.SaleDetail
+        query = db.query(
+            weekday.label('weekday'),
+            hour.label('hour'),
+            func.count(func.distinct(Sale.id)).label('total_sales'),
+            func.sum(SaleDetail.subtotal).label('total_revenue')
+        ).join(
+            SaleDetail, SaleDetail.sale_id == Sale.id
+        ).join(
+            product_models.Product, SaleDetail.product_id == product_models.Product.id
+        ).filter(
+            product_models.Product.category_id == category_id
+        )
+    return query.filter(
+        Sale.fecha >= start,
+        Sale.fecha < end
+    ).group_by(weekday, hour).all()
@@ -1,12 +1,21 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 import models.sale_detail as models
 import schemas.sale_detail_schema as schemas
+from crud.product_crud import PRODUCT_LOAD_OPTIONS
+
+DETAIL_LOAD_OPTIONS = (
+    joinedload(models.SaleDetail.product).options(*PRODUCT_LOAD_OPTIONS),
+)
 
 def get_sale_details(db: Session, sale_id: int):
-    return db.query(models.SaleDetail).filter(models.SaleDetail.sale_id == sale_id).all()
+    return db.query(models.SaleDetail).options(*DETAIL_LOAD_OPTIONS).filter(
+        models.SaleDetail.sale_id == sale_id
+    ).all()
 
 def get_sale_detail(db: Session, detail_id: int):
-    return db.query(models.SaleDetail).filter(models.SaleDetail.id == detail_id).first()
+    return db.query(models.SaleDetail).options(*DETAIL_LOAD_OPTIONS).filter(
+        models.SaleDetail.id == detail_id
+    ).first()
 
 def create_sale_detail(db: Session, detail: schemas.SaleDetailCreate, sale_id: int):
     db_detail = models.SaleDetail(
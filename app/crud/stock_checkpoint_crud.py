@@ -0,0 +1,118 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select, insert, delete, and_, or_, literal
+from datetime import date, datetime
+import time
+from models.product import Product
+from models.inventory_movement import InventoryMovement
+from models.stock_checkpoint import StockCheckpoint
+from crud import pagination
+
+def nearest_checkpoint(db: Session, moment: datetime):
+    """(as_of, last_movement_id) del último checkpoint en o antes de moment, o None"""
+    return db.query(
+        StockCheckpoint.as_of,
+        StockCheckpoint.last_movement_id
+    ).filter(
+        StockCheckpoint.as_of <= moment
+    ).order_by(StockCheckpoint.as_of.desc()).first()
+
+def _movement_filters(moment: datetime, checkpoint=None, upper_id: int = None):
+    """Condiciones de los movimientos que hay que sumar al checkpoint para moment"""
+    movement = InventoryMovement
+    filters = [movement.movement_date < moment]
+    if checkpoint:
+        as_of, last_movement_id = checkpoint
+        filters.append(or_(movement.movement_date >= as_of, movement.id > last_movement_id))
+    if upper_id is not None:
+        filters.append(movement.id <= upper_id)
+    return filters
+
+def _stock_at_select(moment: datetime, checkpoint=None, upper_id: int = None, product_id: int = None):
+    """Select de (product_id, stock) por producto antes de moment.
+
+    Parte del checkpoint y suma solo los movimientos posteriores, más los
+    que se registraron después del checkpoint con fecha anterior (p. ej.
+    ventas offline). Sin checkpoint suma todo el historial.
+    """
+    movement = InventoryMovement
+    moved = select(
+        movement.product_id,
+        func.sum(movement.quantity).label('delta')
+    ).where(*_movement_filters(moment, checkpoint, upper_id))
+    if product_id:
+        moved = moved.where(movement.product_id == product_id)
+    moved = moved.group_by(movement.product_id).subquery()
+
+    stock = func.coalesce(moved.c.delta, 0)
+    query = select(Product.id.label('product_id'))
+    if checkpoint:
+        query = query.outerjoin(StockCheckpoint, and_(
+            StockCheckpoint.product_id == Product.id,
+            StockCheckpoint.as_of == checkpoint[0]
+        ))
+        stock = func.coalesce(StockCheckpoint.stock, 0) + stock
+    query = query.outerjoin(moved, moved.c.product_id == Product.id)
+    if product_id:
+        query = query.where(Product.id == product_id)
+    return query, stock
+
+def get_stock_at(db: Session, day: date, product_id: int = None):
+    """Stock de cada producto al cierre de day y el checkpoint usado (o None)"""
+    _, moment = pagination.day_range(None, day)
+    checkpoint = nearest_checkpoint(db, moment)
+    query, stock = _stock_at_select(moment, checkpoint, product_id=product_id)
+    rows = db.execute(query.add_columns(
+        Product.code,
+        Product.name,
+        Product.is_active,
+        stock.label('stock')
+    ).order_by(Product.id)).all()
+    return rows, checkpoint.as_of if checkpoint else None
+
+def _count_movements(db: Session, moment: datetime, checkpoint, upper_id: int):
+    return db.execute(select(func.count()).select_from(InventoryMovement).where(
+        *_movement_filters(moment, checkpoint, upper_id)
+    )).scalar()
+
+def take_checkpoint(db: Session, as_of: datetime = None, settle_seconds: float = 10, attempts: int = 3):
+    """Guarda el stock de cada producto antes de as_of (por defecto hoy a las 00:00).
+
+    El último id de movimiento y el stock salen de la misma instantánea
+    (REPEATABLE READ en PostgreSQL), así last_movement_id solo cubre
+    movimientos confirmados. Un movimiento con id menor que aún no había
+    confirmado quedaría fuera para siempre: tras settle_seconds se vuelven a
+    contar los movimientos cubiertos y, si cambiaron, se recalcula hasta
+    attempts veces. Solo guarda productos con stock distinto de cero;
+    reemplaza un checkpoint existente con el mismo as_of. Devuelve cuántas
+    filas escribió.
+    """
+    as_of = as_of or pagination.day_range(date.today())[0]
+    for _ in range(attempts):
+        if db.get_bind().dialect.name == 'postgresql':
+            db.connection(execution_options={'isolation_level': 'REPEATABLE READ'})
+        upper_id = db.execute(select(func.coalesce(func.max(InventoryMovement.id), 0))).scalar()
+        db.execute(delete(StockCheckpoint).where(StockCheckpoint.as_of == as_of))
+        previous = nearest_checkpoint(db, as_of)
+        counted = _count_movements(db, as_of, previous, upper_id)
+        query, stock = _stock_at_select(as_of, previous, upper_id)
+        written = db.execute(insert(StockCheckpoint).from_select(
+            ['product_id', 'stock', 'as_of', 'last_movement_id', 'created_at'],
+            query.add_columns(
+                stock,
+                literal(as_of, StockCheckpoint.as_of.type),
+                literal(upper_id, StockCheckpoint.last_movement_id.type),
+                literal(datetime.utcnow(), StockCheckpoint.created_at.type)
+            ).where(stock != 0)
+        )).rowcount
+        db.commit()
+
+        # Transactions still open in the snapshot commit while we wait
+        if settle_seconds:
+            time.sleep(settle_seconds)
+        late = _count_movements(db, as_of, previous, upper_id) != counted
+        db.rollback()
+        if not late:
+            return written
+    db.execute(delete(StockCheckpoint).where(StockCheckpoint.as_of == as_of))
+    db.commit()
+    raise RuntimeError(f"Movements before {as_of} kept committing late; checkpoint not stored")
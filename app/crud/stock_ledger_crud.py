@@ -0,0 +1,161 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import insert, select, delete, func
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+from models.product import Product
+from models.inventory_movement import InventoryMovement
+from models.stock_checkpoint import StockCheckpoint
+from services import events
+
+class StockChange(NamedTuple):
+    product_id: int
+    quantity: int  # positive for in, negative for out
+    movement_type: str  # sale, purchase, adjustment, return
+    reference_type: Optional[str] = None  # sale, purchase_order, adjustment, product
+    reference_id: Optional[int] = None
+    notes: Optional[str] = None
+    movement_date: Optional[datetime] = None  # defaults to the moment passed to apply_changes
+
+def lock_products(db: Session, product_ids, active_only: bool = False):
+    # Load and lock every product with a single query. Rows are locked in
+    # id order so concurrent writers sharing SKUs queue behind each other
+    # instead of deadlocking or overselling.
+    query = db.query(Product).filter(Product.id.in_(product_ids))
+    if active_only:
+        query = query.filter(Product.is_active == True)
+    return {
+        product.id: product
+        for product in query.order_by(Product.id).with_for_update().populate_existing().all()
+    }
+
+def apply_changes(db: Session, changes, products: dict = None, moment: datetime = None):
+    """Aplica cambios de stock y registra un movimiento por cambio, sin confirmar.
+
+    Bloquea los productos (o usa products, ya bloqueados por el llamador),
+    aplica los cambios en orden y agrega todos los movimientos, con el stock
+    anterior y el nuevo, en un solo insert. Lanza ValueError si un producto
+    no existe o su stock quedaría negativo.
+
+    Devuelve los cruces de min_stock por producto, para publicarlos después
+    del commit.
+    """
+    changes = [change for change in changes if change.quantity]
+    if not changes:
+        return []
+    if products is None:
+        products = lock_products(db, {change.product_id for change in changes})
+    moment = moment or datetime.now()
+    starting_stock = {}
+    movements = []
+    for change in changes:
+        product = products.get(change.product_id)
+        if product is None:
+            raise ValueError(f"Product with id {change.product_id} not found")
+        previous_stock = product.stock or 0
+        new_stock = previous_stock + change.quantity
+        if new_stock < 0:
+            raise ValueError(
+                f"Insufficient stock for product {product.name}. "
+                f"Available: {previous_stock}, Requested: {-change.quantity}"
+            )
+        starting_stock.setdefault(product.id, previous_stock)
+        product.stock = new_stock
+        movements.append({
+            'product_id': product.id,
+            'movement_type': change.movement_type,
+            'quantity': change.quantity,
+            'reference_type': change.reference_type,
+            'reference_id': change.reference_id,
+            'movement_date': change.movement_date or moment,
+            'notes': change.notes,
+            'previous_stock': previous_stock,
+            'new_stock': new_stock
+        })
+    db.execute(insert(InventoryMovement), movements)
+    return [
+        events.stock_crossing(products[product_id], previous_stock)
+        for product_id, previous_stock in starting_stock.items()
+    ]
+
+def set_stock(db: Session, product_id: int, new_stock: int, notes: str = None):
+    """Ajusta el stock a un valor absoluto como movimiento 'adjustment'.
+
+    Devuelve los cruces igual que apply_changes.
+    """
+    if new_stock is None or new_stock < 0:
+        raise ValueError("Stock debe ser un número positivo")
+    products = lock_products(db, [product_id])
+    if product_id not in products:
+        raise ValueError(f"Product with id {product_id} not found")
+    return apply_changes(db, [StockChange(
+        product_id=product_id,
+        quantity=new_stock - (products[product_id].stock or 0),
+        movement_type='adjustment',
+        reference_type='adjustment',
+        notes=notes
+    )], products)
+
+def record_opening_stock(db: Session, products, moment: datetime = None):
+    """Registra el stock inicial de productos recién creados (ya con id), sin confirmar"""
+    moment = moment or datetime.now()
+    movements = [
+        {
+            'product_id': product.id,
+            'movement_type': 'adjustment',
+            'quantity': product.stock,
+            'reference_type': 'product',
+            'reference_id': product.id,
+            'movement_date': moment,
+            'notes': "Opening stock",
+            'previous_stock': 0,
+            'new_stock': product.stock
+        }
+        for product in products
+        if product.stock
+    ]
+    if movements:
+        db.execute(insert(InventoryMovement), movements)
+
+def backfill_opening_stock(db: Session):
+    """Registra un ajuste inicial para cada producto cuyo stock no coincide con
+    la suma de sus movimientos (stock cargado antes de que existiera el libro).
+
+    El ajuste se fecha un segundo antes del primer movimiento del producto, o
+    en su alta si no tiene, así el stock a una fecha lo cuenta desde el
+    principio. Borra los checkpoints, calculados sin él. Es idempotente;
+    devuelve cuántos productos ajustó.
+    """
+    moved = select(
+        InventoryMovement.product_id,
+        func.sum(InventoryMovement.quantity).label('total'),
+        func.min(InventoryMovement.movement_date).label('first_at')
+    ).group_by(InventoryMovement.product_id).subquery()
+    # One statement: stock and movements come from the same snapshot
+    rows = db.execute(select(
+        Product.id,
+        func.coalesce(Product.stock, 0) - func.coalesce(moved.c.total, 0),
+        moved.c.first_at,
+        Product.created_at
+    ).outerjoin(moved, moved.c.product_id == Product.id).where(
+        func.coalesce(Product.stock, 0) != func.coalesce(moved.c.total, 0)
+    )).all()
+    now = datetime.now()
+    movements = [
+        {
+            'product_id': product_id,
+            'movement_type': 'adjustment',
+            'quantity': missing,
+            'reference_type': 'product',
+            'reference_id': product_id,
+            'movement_date': first_at - timedelta(seconds=1) if first_at else created_at or now,
+            'notes': "Opening stock (backfill)",
+            'previous_stock': 0,
+            'new_stock': missing
+        }
+        for product_id, missing, first_at, created_at in rows
+    ]
+    if movements:
+        db.execute(insert(InventoryMovement), movements)
+        db.execute(delete(StockCheckpoint))
+    db.commit()
+    return len(movements)
@@ -0,0 +1,125 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select, insert, update, delete, cast, and_, or_, Float
+from datetime import date, datetime, timedelta
+import numpy as np
+from models.product import Product
+from models.product_daily_sales import ProductDailySales
+from models.stock_recommendation import StockRecommendation
+from services import demand_forecast, metrics_cache, events
+
+def _demand_sums(db: Session, start_date, end_date):
+    """Por producto activo: (id, created_at, unidades, suma de cuadrados diarios)"""
+    rollup = ProductDailySales
+    sold = select(
+        rollup.product_id,
+        func.sum(rollup.quantity).label('units'),
+        func.sum(cast(rollup.quantity, Float) * rollup.quantity).label('squares')
+    ).where(
+        rollup.date >= start_date,
+        rollup.date <= end_date
+    ).group_by(rollup.product_id).subquery()
+    return db.execute(select(
+        Product.id,
+        Product.created_at,
+        func.coalesce(sold.c.units, 0),
+        func.coalesce(sold.c.squares, 0)
+    ).outerjoin(sold, sold.c.product_id == Product.id).where(
+        Product.is_active == True
+    )).all()
+
+def compute_recommendations(db: Session, window_days: int, lead_time_days: float, service_z: float, end_date: date = None):
+    """Recalcula stock_recommendations para todo el catálogo activo.
+
+    Usa los window_days días completos hasta end_date (por defecto ayer) del
+    resumen por producto y día. Los productos creados dentro de la ventana
+    solo cuentan los días desde su alta. Reemplaza las recomendaciones
+    anteriores y devuelve cuántas escribió.
+    """
+    end_date = end_date or date.today() - timedelta(days=1)
+    start_date = end_date - timedelta(days=window_days - 1)
+    rows = _demand_sums(db, start_date, end_date)
+    if rows:
+        ids, created, units, squares = zip(*rows)
+    else:
+        ids, created, units, squares = (), (), (), ()
+
+    created_days = np.array(created, dtype='datetime64[D]')
+    days_listed = (np.datetime64(end_date, 'D') - created_days).astype(np.int64) + 1
+    observed_days = np.where(np.isnat(created_days), window_days, np.clip(days_listed, 1, window_days))
+    mean, std, safety_stock, reorder_point = demand_forecast.reorder_points(
+        units, squares, observed_days, lead_time_days, service_z
+    )
+
+    now = datetime.utcnow()
+    db.execute(delete(StockRecommendation))
+    if ids:
+        db.execute(insert(StockRecommendation), [
+            {
+                'product_id': product_id,
+                'window_days': window_days,
+                'lead_time_days': lead_time_days,
+                'avg_daily_demand': product_mean,
+                'demand_std': product_std,
+                'safety_stock': product_safety,
+                'recommended_min_stock': product_reorder,
+                'computed_at': now
+            }
+            for product_id, product_mean, product_std, product_safety, product_reorder in zip(
+                ids, mean.tolist(), std.tolist(), safety_stock.tolist(), reorder_point.tolist()
+            )
+        ])
+    db.commit()
+    return len(ids)
+
+def get_recommendations(db: Session, skip: int = 0, limit: int = 100, only_changes: bool = False):
+    query = db.query(
+        StockRecommendation,
+        Product.code,
+        Product.name,
+        Product.stock,
+        Product.min_stock
+    ).join(Product, StockRecommendation.product_id == Product.id).filter(
+        Product.is_active == True
+    )
+    if only_changes:
+        query = query.filter(Product.min_stock != StockRecommendation.recommended_min_stock)
+    return query.order_by(StockRecommendation.product_id).offset(skip).limit(limit).all()
+
+def apply_recommendations(db: Session):
+    """Copia las recomendaciones a Product.min_stock y devuelve cuántos productos cambiaron"""
+    rec = StockRecommendation
+    pending = and_(
+        Product.id == rec.product_id,
+        Product.is_active == True,
+        Product.min_stock != rec.recommended_min_stock
+    )
+    # Only products whose low-stock status flips need an event; rows carry
+    # the new min_stock so events.stock_crossing can read them like a Product
+    crossing_rows = db.query(
+        Product.id,
+        Product.code,
+        Product.name,
+        Product.stock,
+        Product.is_active,
+        Product.min_stock.label('previous_min_stock'),
+        rec.recommended_min_stock.label('min_stock')
+    ).filter(pending, or_(
+        and_(Product.stock <= Product.min_stock, Product.stock > rec.recommended_min_stock),
+        and_(Product.stock > Product.min_stock, Product.stock <= rec.recommended_min_stock)
+    )).all()
+    crossings = [events.stock_crossing(row, row.stock, row.previous_min_stock) for row in crossing_rows]
+
+    now = datetime.utcnow()
+    updated = db.execute(
+        update(Product).where(pending).values(
+            min_stock=rec.recommended_min_stock,
+            updated_at=now
+        ).execution_options(synchronize_session=False)
+    ).rowcount
+    db.execute(update(rec).where(
+        rec.product_id.in_(select(Product.id).where(Product.is_active == True))
+    ).values(applied_at=now).execution_options(synchronize_session=False))
+    db.commit()
+    metrics_cache.dashboard_metrics.invalidate()
+    events.publish_all(crossings)
+    return updated
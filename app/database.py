@@ -1,16 +1,180 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text, inspect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateIndex
+import asyncio
 import os
+import threading
+import time
+import config
 
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://user:password@db:5432/pos_db")
 engine = create_engine(DATABASE_URL, pool_size=10, max_overflow=20, pool_timeout=30)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Read replica for dashboard, reports and GET endpoints; defaults to the primary
+# (also when DATABASE_READ_URL is the primary's own URL)
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+read_engine = engine
+if DATABASE_READ_URL and DATABASE_READ_URL != DATABASE_URL:
+    read_engine = create_engine(DATABASE_READ_URL, pool_size=10, max_overflow=20, pool_timeout=30, pool_pre_ping=True)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# Replay lag in seconds; 0 when not a standby or when it has replayed all it received
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+_replica_lock = threading.Lock()
+_replica_checked_at = float("-inf")
+_replica_usable = False
+
+# Async engine (asyncpg) for the hot paths, enabled with DATABASE_ASYNC=true
+USE_ASYNC_DB = os.getenv("DATABASE_ASYNC", "false").lower() in ("1", "true", "yes")
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+)
+ASYNC_DATABASE_READ_URL = os.getenv(
+    "ASYNC_DATABASE_READ_URL",
+    DATABASE_READ_URL and DATABASE_READ_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+)
+async_engine = None
+AsyncSessionLocal = None
+AsyncReadSessionLocal = None
+if USE_ASYNC_DB:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, pool_size=10, max_overflow=20, pool_timeout=30)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    AsyncReadSessionLocal = AsyncSessionLocal
+    if ASYNC_DATABASE_READ_URL and ASYNC_DATABASE_READ_URL != ASYNC_DATABASE_URL:
+        async_read_engine = create_async_engine(
+            ASYNC_DATABASE_READ_URL, pool_size=10, max_overflow=20, pool_timeout=30, pool_pre_ping=True
+        )
+        AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
+def replica_usable():
+    """True si la réplica responde y su retraso no supera REPLICA_MAX_LAG_SECONDS.
+
+    El resultado se reutiliza durante REPLICA_CHECK_INTERVAL_SECONDS.
+    """
+    global _replica_checked_at, _replica_usable
+    if read_engine is engine:
+        return False
+    with _replica_lock:
+        if time.monotonic() - _replica_checked_at < config.REPLICA_CHECK_INTERVAL_SECONDS:
+            return _replica_usable
+        try:
+            with read_engine.connect() as conn:
+                lag = conn.execute(REPLICA_LAG_SQL).scalar() if read_engine.dialect.name == "postgresql" else 0
+            _replica_usable = float(lag) <= config.REPLICA_MAX_LAG_SECONDS
+        except Exception:
+            _replica_usable = False  # replica down: read from the primary
+        _replica_checked_at = time.monotonic()
+        return _replica_usable
+
+def add_missing_columns(bind=None):
+    """Añade a las tablas existentes las columnas nulables del modelo que les falten.
+
+    create_all no modifica tablas ya creadas. Las columnas NOT NULL necesitan
+    un valor para las filas existentes y se migran a mano.
+    """
+    bind = bind or engine
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        quote = conn.dialect.identifier_preparer.quote
+        # SQLite has no ADD COLUMN IF NOT EXISTS
+        if_not_exists = "IF NOT EXISTS " if conn.dialect.name == "postgresql" else ""
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                conn.execute(text(
+                    f"ALTER TABLE {quote(table.name)} ADD COLUMN {if_not_exists}"
+                    f"{quote(column.name)} {column.type.compile(dialect=conn.dialect)}"
+                ))
+
+# pg_advisory_lock key held by the worker building missing indexes
+INDEX_BUILD_LOCK_ID = 230_001
+
+def _missing_indexes(conn, invalid=()):
+    """Índices del modelo que no existen (o son inválidos) en tablas ya creadas"""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)} - set(invalid)
+        for index in table.indexes:
+            if index.name not in existing:
+                yield index
+
+def create_missing_indexes(bind=None):
+    """Crea los índices del modelo que falten en tablas ya existentes.
+
+    create_all solo crea los índices junto con su tabla, así que una base
+    creada antes de añadirlos se queda sin ellos. Llamar después de create_all.
+    En PostgreSQL los construye con CREATE INDEX CONCURRENTLY, sin bloquear
+    escrituras, y un solo worker a la vez: los demás arrancan sin esperarlo.
+    """
+    bind = bind or engine
+    if bind.dialect.name != "postgresql":
+        with bind.begin() as conn:
+            for index in list(_missing_indexes(conn)):
+                conn.execute(CreateIndex(index))
+        return
+    # CONCURRENTLY cannot run inside a transaction
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        lock = {"key": INDEX_BUILD_LOCK_ID}
+        if not conn.execute(text("SELECT pg_try_advisory_lock(:key)"), lock).scalar():
+            return  # another worker is building them
+        try:
+            # A concurrent build that died halfway leaves an invalid index behind
+            invalid = set(conn.execute(text(
+                "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE NOT i.indisvalid"
+            )).scalars())
+            quote = conn.dialect.identifier_preparer.quote
+            for index in list(_missing_indexes(conn, invalid)):
+                if index.name in invalid:
+                    conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {quote(index.name)}"))
+                options = index.dialect_options["postgresql"]
+                options["concurrently"] = True
+                try:
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+                finally:
+                    options["concurrently"] = False
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), lock)
+
+def read_session():
+    """Sesión de solo lectura: réplica si está al día, si no el primario"""
+    return ReadSessionLocal() if replica_usable() else SessionLocal()
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def get_read_db():
+    db = read_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db():
+    # The lag check is blocking; it is cached, so the thread hop is rare
+    use_replica = AsyncReadSessionLocal is not AsyncSessionLocal and await asyncio.to_thread(replica_usable)
+    async with (AsyncReadSessionLocal if use_replica else AsyncSessionLocal)() as db:
+        yield db
\ No newline at end of file
@@ -0,0 +1,32 @@
+"""Backfill opening-stock movements so the ledger sums to Product.stock.
+
+Databases created before every stock change went through the ledger hold
+products whose stock was never recorded as a movement. Run once from the
+app directory (running it again changes nothing):
+
+    python -m jobs.backfill_stock_ledger
+"""
+import argparse
+import time
+
+from database import Base, engine, SessionLocal
+import models.product  # noqa: F401  (register mappers)
+from crud import stock_ledger_crud
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        adjusted = stock_ledger_crud.backfill_opening_stock(db)
+    finally:
+        db.close()
+    print(f"opening stock recorded for {adjusted} products in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
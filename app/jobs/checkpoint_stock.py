@@ -0,0 +1,50 @@
+"""Store per-product stock checkpoints for GET /inventory/stock-at.
+
+Run from the app directory, e.g. nightly; by default the checkpoint holds
+the stock at today's 00:00. With --every it keeps running and stores each
+day's checkpoint on the first run after midnight (docker-compose runs it
+this way as the stock-checkpoint service):
+
+    python -m jobs.checkpoint_stock
+    python -m jobs.checkpoint_stock --as-of 2025-06-01
+    python -m jobs.checkpoint_stock --every 3600
+"""
+import argparse
+import time
+from datetime import date
+
+from database import Base, engine, SessionLocal
+import models.product  # noqa: F401  (register mappers)
+from crud import stock_checkpoint_crud, pagination
+
+
+def run(as_of, settle):
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        written = stock_checkpoint_crud.take_checkpoint(db, as_of, settle)
+    finally:
+        db.close()
+    print(f"checkpoint with {written} products written in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--as-of", type=date.fromisoformat, help="checkpoint the stock at 00:00 of this day")
+    parser.add_argument("--settle", type=float, default=10, help="seconds to wait before checking for late commits")
+    parser.add_argument("--every", type=float, help="repeat every N seconds, checkpointing each new day once")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    as_of = pagination.day_range(args.as_of)[0] if args.as_of else None
+    run(as_of, args.settle)
+    last_day = date.today()
+    while args.every:
+        time.sleep(args.every)
+        if date.today() != last_day:
+            run(None, args.settle)
+            last_day = date.today()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Recompute the recommended min_stock of every active product from its demand.
+
+Run from the app directory, e.g. nightly; --apply also copies the
+recommendations to products.min_stock:
+
+    python -m jobs.forecast_demand
+    python -m jobs.forecast_demand --window 60 --lead-time 5 --apply
+"""
+import argparse
+import time
+
+from config import FORECAST_WINDOW_DAYS, FORECAST_LEAD_TIME_DAYS, FORECAST_SERVICE_LEVEL_Z
+from database import Base, engine, SessionLocal
+import models.product  # noqa: F401  (register mappers)
+from crud import stock_recommendation_crud
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--window", type=int, default=FORECAST_WINDOW_DAYS, help="days of sales history")
+    parser.add_argument("--lead-time", type=float, default=FORECAST_LEAD_TIME_DAYS, help="replenishment lead time in days")
+    parser.add_argument("--z", type=float, default=FORECAST_SERVICE_LEVEL_Z, help="service level z-score")
+    parser.add_argument("--apply", action="store_true", help="write the recommendations to products.min_stock")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        computed = stock_recommendation_crud.compute_recommendations(db, args.window, args.lead_time, args.z)
+        print(f"{computed} recommendations computed in {time.perf_counter() - started:.1f}s")
+        if args.apply:
+            updated = stock_recommendation_crud.apply_recommendations(db)
+            print(f"min_stock updated for {updated} products")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
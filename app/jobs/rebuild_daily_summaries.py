@@ -0,0 +1,32 @@
+"""Backfill or rebuild the daily_summaries and product_daily_sales rollups from raw sales.
+
+Run from the app directory; without dates every day is rebuilt:
+
+    python -m jobs.rebuild_daily_summaries --from 2025-01-01 --to 2025-12-31
+"""
+import argparse
+from datetime import date
+
+from database import Base, engine, SessionLocal
+import models.product  # noqa: F401  (register mappers)
+from crud import daily_summary_crud
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat)
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        daily_summary_crud.rebuild_daily_summaries(db, args.date_from, args.date_to)
+        daily_summary_crud.rebuild_product_daily_sales(db, args.date_from, args.date_to)
+    finally:
+        db.close()
+    print("daily summaries and product daily sales rebuilt")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Write incremental Parquet snapshots for the analytics engine.
+
+Run from the app directory, once or periodically:
+
+    python -m jobs.snapshot_analytics
+    python -m jobs.snapshot_analytics --every 900
+    python -m jobs.snapshot_analytics --every 900 --full-every 86400
+    python -m jobs.snapshot_analytics --full    # rewrite everything
+"""
+import argparse
+import time
+
+from database import read_session
+from services import analytics_snapshot
+
+
+def run(full, settle):
+    db = read_session()
+    try:
+        started = time.perf_counter()
+        exported = analytics_snapshot.take_snapshot(db, full=full, settle_seconds=settle)
+    finally:
+        db.close()
+    rows = ", ".join(f"{table}={count}" for table, count in exported.items())
+    print(f"snapshot written in {time.perf_counter() - started:.1f}s ({rows})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--full", action="store_true", help="discard existing files and export everything")
+    parser.add_argument("--settle", type=float, default=10, help="seconds to wait for in-flight transactions")
+    parser.add_argument("--every", type=float, help="repeat every N seconds")
+    parser.add_argument(
+        "--full-every", type=float,
+        help="with --every, rewrite everything every N seconds (older edits and deletes)"
+    )
+    args = parser.parse_args()
+
+    run(args.full, args.settle)
+    last_full = time.monotonic()
+    while args.every:
+        time.sleep(args.every)
+        full = bool(args.full_every) and time.monotonic() - last_full >= args.full_every
+        run(full, args.settle)
+        if full:
+            last_full = time.monotonic()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from database import add_missing_columns, create_missing_indexes
 from routers.product_routes import router as product_router
 from routers.sale_routes import router as sale_router
 from routers.sale_detail_routes import router as sale_detail_router 
@@ -26,10 +27,15 @@ app.include_router(reports_router)
 app.include_router(inventory_router)
 app.include_router(seed_router)
 
+# Columns and indexes added to the models after their tables were created
+add_missing_columns()
+create_missing_indexes()
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Snapshot-At", "X-Checkpoint-At"],
 )
\ No newline at end of file
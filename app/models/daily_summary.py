@@ -9,9 +9,9 @@ class DailySummary(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     date = Column(Date, nullable=False, unique=True)
-    total_sales = Column(Integer, default=0)
-    total_revenue = Column(Float, default=0.0)
+    total_sales = Column(Integer, default=0)  # number of sales
+    total_revenue = Column(Float, default=0.0)  # sum of Sale.total
     total_products_sold = Column(Integer, default=0)
-    total_transactions = Column(Integer, default=0)
+    total_transactions = Column(Integer, default=0)  # number of sale lines
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
\ No newline at end of file
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, Sequence
+from database import Base
+import config
+
+# Prefixes with their own numbering: purchase orders, restock orders, sale receipts
+DOCUMENT_PREFIXES = ('PO', 'RST', 'REC')
+
+# PostgreSQL: one sequence per prefix; each nextval reserves a whole block
+DOCUMENT_SEQUENCES = {
+    prefix: Sequence(
+        f"{prefix.lower()}_number_seq",
+        start=1,
+        increment=config.DOCUMENT_NUMBER_BLOCK_SIZE,
+        metadata=Base.metadata
+    )
+    for prefix in DOCUMENT_PREFIXES
+}
+
+class DocumentCounter(Base):
+    # Fallback for databases without sequences (SQLite)
+    __tablename__ = 'document_counters'
+    
+    prefix = Column(String(10), primary_key=True)
+    last_value = Column(Integer, nullable=False, default=0)  # highest number already reserved
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, UniqueConstraint
+from datetime import datetime
+from database import Base
+
+class IdempotencyKey(Base):
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (UniqueConstraint('scope', 'key', name='uq_idempotency_scope_key'),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String(50), nullable=False)  # e.g. sales, purchase_orders
+    key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)
+    status = Column(String(20), default='in_progress')  # in_progress, completed
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)  # JSON-encoded response
+    created_at = Column(DateTime, default=datetime.utcnow)
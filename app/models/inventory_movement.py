@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -7,9 +7,12 @@ import models.product
 
 class InventoryMovement(Base):
     __tablename__ = 'inventory_movements'
+    __table_args__ = (
+        Index('ix_inventory_movements_date_product', 'movement_date', 'product_id'),  # stock at a date
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, ForeignKey('products.id'), nullable=False)
+    product_id = Column(Integer, ForeignKey('products.id'), nullable=False, index=True)
     movement_type = Column(String(20), nullable=False)  # sale, purchase, adjustment, return
     quantity = Column(Integer, nullable=False)  # positive for in, negative for out
     reference_type = Column(String(20), nullable=True)  # sale, purchase_order, adjustment
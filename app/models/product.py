@@ -1,5 +1,5 @@
 import models.inventory_movement
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Boolean, Index, and_
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -30,4 +30,10 @@ class Product(Base):
     supplier = relationship("Supplier", back_populates="products")
     sale_details = relationship("SaleDetail", back_populates="product")
     purchase_order_details = relationship("PurchaseOrderDetail", back_populates="product")
-    inventory_movements = relationship("InventoryMovement", back_populates="product")
\ No newline at end of file
+    inventory_movements = relationship("InventoryMovement", back_populates="product")
+
+# Partial index holding only low-stock products: get_low_stock_items and
+# get_low_stock_count filter with this exact predicate, so they read
+# O(low-stock products) instead of scanning the catalog
+_LOW_STOCK = and_(Product.stock <= Product.min_stock, Product.is_active == True)
+Index('ix_products_low_stock', Product.stock, postgresql_where=_LOW_STOCK, sqlite_where=_LOW_STOCK)
\ No newline at end of file
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, Float, Date, DateTime, ForeignKey, Index, UniqueConstraint
+from datetime import datetime
+from database import Base
+
+class ProductDailySales(Base):
+    __tablename__ = 'product_daily_sales'
+    __table_args__ = (
+        UniqueConstraint('product_id', 'date', name='uq_product_daily_sales_product_date'),
+        Index('ix_product_daily_sales_date_product', 'date', 'product_id'),  # date windows
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey('products.id'), nullable=False)
+    date = Column(Date, nullable=False)
+    quantity = Column(Integer, default=0)  # units sold
+    revenue = Column(Float, default=0.0)  # sum of SaleDetail.subtotal
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
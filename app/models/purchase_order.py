@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -8,6 +8,9 @@ from database import Base
 
 class PurchaseOrder(Base):
     __tablename__ = 'purchase_orders'
+    __table_args__ = (
+        Index('ix_purchase_orders_order_date_id', 'order_date', 'id'),  # keyset pagination
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     order_number = Column(String(50), nullable=False, unique=True)
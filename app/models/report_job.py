@@ -0,0 +1,21 @@
+from sqlalchemy import Column, String, DateTime, Text, UniqueConstraint
+from datetime import datetime
+from database import Base
+
+class ReportJob(Base):
+    __tablename__ = 'report_jobs'
+    __table_args__ = (
+        UniqueConstraint('params_key', 'sales_version', name='uq_report_jobs_params_version'),
+    )
+    
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    report = Column(String(30), nullable=False)  # sales, products
+    params = Column(Text, nullable=False)  # JSON-encoded request
+    params_key = Column(String(64), nullable=False)  # hash of report + params
+    sales_version = Column(String(64), nullable=False)  # data the result was computed from (get_data_version)
+    status = Column(String(20), default='queued')  # queued, running, done, failed
+    result = Column(Text, nullable=True)  # JSON-encoded rows
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -7,8 +7,13 @@ from database import Base
 
 class Sale(Base):
     __tablename__ = 'sales'
+    __table_args__ = (
+        Index('ix_sales_fecha_id', 'fecha', 'id'),  # date ranges and keyset pagination
+        Index('ix_sales_receipt_number', 'receipt_number', unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
+    receipt_number = Column(String(50), nullable=True)  # REC-00000001; older sales have none
     fecha = Column(DateTime, nullable=False, default=datetime.utcnow)  # Changed to DateTime
     total = Column(Float, nullable=False)
     tax_amount = Column(Float, default=0.0)  # Added tax support
@@ -9,8 +9,8 @@ class SaleDetail(Base):
     __tablename__ = 'sale_details'
     
     id = Column(Integer, primary_key=True, index=True)
-    sale_id = Column(Integer, ForeignKey('sales.id'), nullable=False)
-    product_id = Column(Integer, ForeignKey('products.id'), nullable=False)
+    sale_id = Column(Integer, ForeignKey('sales.id'), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey('products.id'), nullable=False, index=True)
     quantity = Column(Integer, nullable=False)
     unit_price = Column(Float, nullable=False)  # Price at time of sale
     subtotal = Column(Float, nullable=False)
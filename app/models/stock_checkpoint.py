@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, UniqueConstraint
+from datetime import datetime
+from database import Base
+
+class StockCheckpoint(Base):
+    __tablename__ = 'stock_checkpoints'
+    __table_args__ = (
+        UniqueConstraint('as_of', 'product_id', name='uq_stock_checkpoints_as_of_product'),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey('products.id'), nullable=False)
+    as_of = Column(DateTime, nullable=False)  # stock from movements dated before this moment
+    stock = Column(Integer, nullable=False)  # products without a row had 0
+    last_movement_id = Column(Integer, nullable=False)  # newest movement counted
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey
+from datetime import datetime
+from database import Base
+
+class StockRecommendation(Base):
+    __tablename__ = 'stock_recommendations'
+    
+    product_id = Column(Integer, ForeignKey('products.id'), primary_key=True)  # one row per product
+    window_days = Column(Integer, nullable=False)  # days of sales history used
+    lead_time_days = Column(Float, nullable=False)
+    avg_daily_demand = Column(Float, default=0.0)
+    demand_std = Column(Float, default=0.0)  # std deviation of daily units sold
+    safety_stock = Column(Integer, default=0)
+    recommended_min_stock = Column(Integer, nullable=False)  # reorder point
+    computed_at = Column(DateTime, default=datetime.utcnow)
+    applied_at = Column(DateTime, nullable=True)  # when copied to Product.min_stock
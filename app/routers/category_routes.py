@@ -3,17 +3,17 @@ from sqlalchemy.orm import Session
 import crud.category_crud as crud
 from models.category import Category
 import schemas.category_schema as schemas
-from database import get_db
+from database import get_db, get_read_db
 from typing import List
 
 router = APIRouter(prefix="/categories", tags=["categories"])
 
 @router.get("/", response_model=List[schemas.Category])
-def read_categories(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_categories(skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)):
     return crud.get_categories(db, skip=skip, limit=limit)
 
 @router.get("/{category_id}", response_model=schemas.Category)
-def read_category(category_id: int, db: Session = Depends(get_db)):
+def read_category(category_id: int, db: Session = Depends(get_read_db)):
     db_category = crud.get_category(db, category_id)
     if not db_category:
         raise HTTPException(
@@ -1,16 +1,31 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, date
-from typing import List
-from database import get_db
+from typing import List, Optional
+import asyncio
+import json
+import time
+from database import SessionLocal, read_session, get_read_db, get_async_read_db, USE_ASYNC_DB
 import schemas.aditional_schemas as schemas
 from crud import sale_crud, product_crud
+from services import metrics_cache, events
+
+# Seconds between keep-alive comments on an idle stream
+STREAM_KEEPALIVE_SECONDS = 15
+# Seconds between fresh snapshots on a stream; bounds the drift from writes
+# made in other workers, whose events only reach their own streams
+STREAM_RESYNC_SECONDS = 60
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
-@router.get("/metrics", response_model=schemas.DashboardMetrics)
-def get_dashboard_metrics(db: Session = Depends(get_db)):
+def collect_dashboard_metrics(db: Session):
     today = date.today()
+    return metrics_cache.dashboard_metrics.get(today, lambda: _compute_dashboard_metrics(db, today))
+
+def _compute_dashboard_metrics(db: Session, today: date):
     daily_sales = sale_crud.get_daily_sales_count(db, today)
     daily_revenue = sale_crud.get_daily_revenue(db, today)
     total_products = product_crud.get_total_products(db)
@@ -22,10 +37,9 @@ def get_dashboard_metrics(db: Session = Depends(get_db)):
         low_stock_count=low_stock_count
     )
 
-@router.get("/best-selling", response_model=List[schemas.BestSellingProduct])
-def get_best_selling_products(limit: int = 10, db: Session = Depends(get_db)):
+def collect_best_selling_products(db: Session, limit: int = 10, category_id: Optional[int] = None):
     thirty_days_ago = datetime.now().date()
-    results = sale_crud.get_best_selling_products(db, thirty_days_ago, limit)
+    results = sale_crud.get_best_selling_products(db, thirty_days_ago, limit, category_id)
     return [
         schemas.BestSellingProduct(
             product_id=result.id,
@@ -35,4 +49,105 @@ def get_best_selling_products(limit: int = 10, db: Session = Depends(get_db)):
             total_revenue=float(result.total_revenue or 0)
         )
         for result in results
-    ]
\ No newline at end of file
+    ]
+
+def _compute_stream_metrics(today: date):
+    # Right after a write the replica may still lack it while its event is
+    # already published, so read the primary until it settles
+    db = SessionLocal() if metrics_cache.dashboard_metrics.settling() else read_session()
+    try:
+        for _ in range(3):
+            seq = events.last_sequence()
+            metrics = _compute_dashboard_metrics(db, today)
+            if events.last_sequence() == seq:
+                break  # no commit published while reading
+        return seq, metrics
+    finally:
+        db.close()
+
+def _metrics_snapshot(resync: bool = False):
+    """Evento 'metrics' con el seq del último evento que la foto ya incluye.
+
+    Todas las conexiones comparten la foto de dashboard_stream mientras no
+    se publique otro evento; el cliente descarta los deltas con seq menor o
+    igual.
+    """
+    today = date.today()
+    seq, metrics = metrics_cache.dashboard_stream.get(
+        (today, events.last_sequence()),
+        lambda: _compute_stream_metrics(today)
+    )
+    return {'type': 'metrics', 'seq': seq, 'resync': resync, **metrics.model_dump()}
+
+def _sse(event: dict):
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+@router.get("/stream")
+async def stream_dashboard(request: Request):
+    """Eventos del dashboard: una foto inicial ('metrics') y luego deltas
+    ('sale', 'sale_deleted', 'low_stock', 'stock_ok', 'product_added',
+    'product_removed') a medida que se confirman los cambios.
+
+    Cada evento lleva seq; los deltas con seq menor o igual al de la última
+    foto ya están incluidos en ella. Se envía una foto nueva (resync=true)
+    si el cliente se atrasa y cada STREAM_RESYNC_SECONDS.
+    """
+    queue = events.subscribe()
+
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            yield _sse(await run_in_threadpool(_metrics_snapshot))
+            next_resync = time.monotonic() + STREAM_RESYNC_SECONDS
+            while not await request.is_disconnected():
+                wait = next_resync - time.monotonic()
+                if wait <= 0:
+                    event = events.RESYNC
+                else:
+                    try:
+                        event = await asyncio.wait_for(queue.get(), min(wait, STREAM_KEEPALIVE_SECONDS))
+                    except asyncio.TimeoutError:
+                        yield ": keep-alive\n\n"
+                        continue
+                if event is events.RESYNC:
+                    yield _sse(await run_in_threadpool(_metrics_snapshot, True))
+                    next_resync = time.monotonic() + STREAM_RESYNC_SECONDS
+                    continue
+                yield _sse(event)
+        finally:
+            events.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/metrics/cache-stats", response_model=schemas.CacheStats)
+def get_dashboard_cache_stats():
+    return metrics_cache.dashboard_metrics.stats()
+
+if USE_ASYNC_DB:
+    @router.get("/metrics", response_model=schemas.DashboardMetrics)
+    async def get_dashboard_metrics(db: AsyncSession = Depends(get_async_read_db)):
+        return await db.run_sync(collect_dashboard_metrics)
+
+    @router.get("/best-selling", response_model=List[schemas.BestSellingProduct])
+    async def get_best_selling_products(
+        limit: int = 10,
+        category_id: Optional[int] = None,
+        db: AsyncSession = Depends(get_async_read_db)
+    ):
+        return await db.run_sync(collect_best_selling_products, limit, category_id)
+else:
+    @router.get("/metrics", response_model=schemas.DashboardMetrics)
+    def get_dashboard_metrics(db: Session = Depends(get_read_db)):
+        return collect_dashboard_metrics(db)
+
+    @router.get("/best-selling", response_model=List[schemas.BestSellingProduct])
+    def get_best_selling_products(
+        limit: int = 10,
+        category_id: Optional[int] = None,
+        db: Session = Depends(get_read_db)
+    ):
+        return collect_best_selling_products(db, limit, category_id)
@@ -1,14 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
+from typing import List, Optional
+from datetime import date
+from database import Base, engine, get_db, get_read_db
 import schemas.aditional_schemas as schemas
-from crud import product_crud, purchase_order_crud
+from crud import product_crud, purchase_order_crud, stock_recommendation_crud, stock_checkpoint_crud
+
+Base.metadata.create_all(bind=engine)
 
 router = APIRouter(prefix="/inventory", tags=["inventory"])
 
 @router.get("/low-stock", response_model=List[schemas.LowStockItem])
-def get_low_stock_items(db: Session = Depends(get_db)):
+def get_low_stock_items(db: Session = Depends(get_read_db)):
     results = product_crud.get_low_stock_items(db)
     return [
         schemas.LowStockItem(
@@ -22,6 +25,68 @@ def get_low_stock_items(db: Session = Depends(get_db)):
         for result in results
     ]
 
+@router.get("/stock-at", response_model=List[schemas.StockAtItem])
+def get_stock_at(
+    response: Response,
+    day: date = Query(..., alias="date", description="Stock at the close of this day"),
+    product_id: Optional[int] = Query(None, description="Only this product"),
+    db: Session = Depends(get_read_db)
+):
+    results, checkpoint_at = stock_checkpoint_crud.get_stock_at(db, day, product_id)
+    if checkpoint_at:
+        response.headers["X-Checkpoint-At"] = checkpoint_at.isoformat()
+    return [
+        schemas.StockAtItem(
+            product_id=result.product_id,
+            product_code=result.code,
+            product_name=result.name,
+            is_active=result.is_active,
+            stock=result.stock
+        )
+        for result in results
+    ]
+
+@router.get("/recommendations", response_model=List[schemas.StockRecommendation])
+def get_stock_recommendations(
+    skip: int = 0,
+    limit: int = 100,
+    only_changes: bool = False,
+    db: Session = Depends(get_read_db)
+):
+    results = stock_recommendation_crud.get_recommendations(db, skip, limit, only_changes)
+    return [
+        schemas.StockRecommendation(
+            product_id=recommendation.product_id,
+            product_code=code,
+            product_name=name,
+            current_stock=stock,
+            min_stock=min_stock,
+            recommended_min_stock=recommendation.recommended_min_stock,
+            avg_daily_demand=recommendation.avg_daily_demand,
+            demand_std=recommendation.demand_std,
+            safety_stock=recommendation.safety_stock,
+            window_days=recommendation.window_days,
+            lead_time_days=recommendation.lead_time_days,
+            computed_at=recommendation.computed_at,
+            applied_at=recommendation.applied_at
+        )
+        for recommendation, code, name, stock, min_stock in results
+    ]
+
+@router.post("/recommendations/apply")
+def apply_stock_recommendations(db: Session = Depends(get_db)):
+    updated = stock_recommendation_crud.apply_recommendations(db)
+    return {"message": f"min_stock updated for {updated} products", "updated": updated}
+
+@router.post("/restock/bulk", response_model=schemas.BulkRestockResult)
+def create_bulk_restock_orders(
+    target_multiplier: float = Query(2.0, ge=1, le=10),
+    db: Session = Depends(get_db)
+):
+    # Declared before /restock/{product_id} so "bulk" is not read as an id
+    orders, skipped = purchase_order_crud.create_bulk_restock_orders(db, target_multiplier)
+    return schemas.BulkRestockResult(orders=orders, skipped_without_supplier=skipped)
+
 @router.post("/restock/{product_id}")
 def create_restock_order(
     product_id: int,
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from crud import product_crud as crud
+from sqlalchemy.ext.asyncio import AsyncSession
+from crud import product_crud as crud, stock_ledger_crud
 from schemas import product_schema as schemas
-from database import Base, engine, get_db
+from database import Base, engine, get_db, get_read_db, get_async_read_db, USE_ASYNC_DB
 
 # Importa los modelos explícitamente
 from models.product import Product
@@ -13,20 +14,35 @@ Base.metadata.create_all(bind=engine)
 
 router = APIRouter(prefix="/products", tags=["products"])
 
-@router.get("", response_model=list[schemas.Product])
-def read_products(db: Session = Depends(get_db)):
-    products = crud.get_products(db)
-    return products
+if USE_ASYNC_DB:
+    @router.get("", response_model=list[schemas.Product])
+    async def read_products(db: AsyncSession = Depends(get_async_read_db)):
+        return await crud.get_products_async(db)
 
-@router.get("/{product_id}", response_model=schemas.Product)
-def read_product(product_id: int, db: Session = Depends(get_db)):
-    product = crud.get_product(db, product_id)
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Producto con ID {product_id} no encontrado"
-        )
-    return product
+    @router.get("/{product_id}", response_model=schemas.Product)
+    async def read_product(product_id: int, db: AsyncSession = Depends(get_async_read_db)):
+        product = await crud.get_product_async(db, product_id)
+        if not product:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Producto con ID {product_id} no encontrado"
+            )
+        return product
+else:
+    @router.get("", response_model=list[schemas.Product])
+    def read_products(db: Session = Depends(get_read_db)):
+        products = crud.get_products(db)
+        return products
+
+    @router.get("/{product_id}", response_model=schemas.Product)
+    def read_product(product_id: int, db: Session = Depends(get_read_db)):
+        product = crud.get_product(db, product_id)
+        if not product:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Producto con ID {product_id} no encontrado"
+            )
+        return product
 
 @router.post("", response_model=schemas.Product, status_code=status.HTTP_201_CREATED)
 def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db)):
@@ -52,7 +68,13 @@ def update_product(
     product: schemas.ProductUpdate, 
     db: Session = Depends(get_db)
 ):
-    db_product = crud.update_product(db, product_id, product)
+    try:
+        db_product = crud.update_product(db, product_id, product)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     if not db_product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -112,8 +134,12 @@ def seed_products(db: Session = Depends(get_db)):
             "is_active": True
         } for i in range(1, 11)
     ]
+    added = []
     for prod in products:
         if not db.query(Product).filter(Product.code == prod["code"]).first():
-            db.add(Product(**prod))
+            added.append(Product(**prod))
+    db.add_all(added)
+    db.flush()
+    stock_ledger_crud.record_opening_stock(db, added)
     db.commit()
     return {"message": "10 products seeded"}
\ No newline at end of file
@@ -3,13 +3,13 @@ from sqlalchemy.orm import Session
 import schemas.purchase_order_detail_schema as schemas
 import crud.purchase_order_detail_crud as crud
 import models
-from database import get_db
+from database import get_db, get_read_db
 from typing import List
 
 router = APIRouter(prefix="/purchase-order-details", tags=["purchase-order-details"])
 
 @router.get("/order/{order_id}", response_model=List[schemas.PurchaseOrderDetail])
-def read_order_details(order_id: int, db: Session = Depends(get_db)):
+def read_order_details(order_id: int, db: Session = Depends(get_read_db)):
     return crud.get_order_details(db, order_id)
 
 @router.patch("/{detail_id}/receive", response_model=schemas.PurchaseOrderDetail)
@@ -24,7 +24,13 @@ def receive_items(
             detail="Quantity must be positive"
         )
     
-    db_detail = crud.update_received_quantity(db, detail_id, quantity)
+    try:
+        db_detail = crud.update_received_quantity(db, detail_id, quantity)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     if not db_detail:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
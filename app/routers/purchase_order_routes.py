@@ -1,29 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from schemas import purchase_order_schemas as schemas
 from crud import purchase_order_crud as crud
-from database import get_db
+from crud import idempotency_crud
+from crud import pagination
+from database import get_db, get_read_db
 from models.purchase_order import PurchaseOrder
 from models.supplier import Supplier
 from models.product import Product
 from typing import List, Optional
+from datetime import date
 
 router = APIRouter(prefix="/purchase-orders", tags=["purchase-orders"])
 
 @router.get("/", response_model=List[schemas.PurchaseOrder])
 def read_orders(
+    response: Response,
     status: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Session = Depends(get_read_db)
 ):
-    query = db.query(PurchaseOrder)
-    if status:
-        query = query.filter(PurchaseOrder.status == status)
-    return query.offset(skip).limit(limit).all()
+    try:
+        orders = crud.get_purchase_orders(
+            db, skip=skip, limit=limit, status=status, cursor=cursor,
+            date_from=date_from, date_to=date_to
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(orders) == limit:
+        response.headers["X-Next-Cursor"] = pagination.encode_cursor(orders[-1].order_date, orders[-1].id)
+    return orders
 
 @router.get("/{order_id}", response_model=schemas.PurchaseOrder)
-def read_order(order_id: int, db: Session = Depends(get_db)):
+def read_order(order_id: int, db: Session = Depends(get_read_db)):
     order = crud.get_purchase_order(db, order_id)
     if not order:
         raise HTTPException(
@@ -33,25 +48,50 @@ def read_order(order_id: int, db: Session = Depends(get_db)):
     return order
 
 @router.post("/", response_model=schemas.PurchaseOrder, status_code=201)
-def create_order(order: schemas.PurchaseOrderCreate, db: Session = Depends(get_db)):
-    supplier = db.query(Supplier).filter(
-        Supplier.id == order.supplier_id
-    ).first()
-    if not supplier:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Supplier not found"
-        )
-    for item in order.items:
-        product = db.query(Product).filter(
-            Product.id == item.product_id
+def create_order(
+    order: schemas.PurchaseOrderCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: Session = Depends(get_db)
+):
+    if idempotency_key:
+        request_hash = idempotency_crud.hash_request(jsonable_encoder(order))
+        stored, error = idempotency_crud.reserve_key(db, "purchase_orders", idempotency_key, request_hash)
+        if error:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=error)
+        if stored:
+            return JSONResponse(status_code=stored[0], content=stored[1])
+    def store_response(db: Session, order_id: int):
+        body = jsonable_encoder(schemas.PurchaseOrder.model_validate(crud.get_purchase_order(db, order_id)))
+        idempotency_crud.record_response(db, "purchase_orders", idempotency_key, status.HTTP_201_CREATED, body)
+    
+    try:
+        supplier = db.query(Supplier).filter(
+            Supplier.id == order.supplier_id
         ).first()
-        if not product:
+        if not supplier:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Product with id {item.product_id} not found"
+                detail="Supplier not found"
             )
-    return crud.create_purchase_order(db, order)
+        for item in order.items:
+            product = db.query(Product).filter(
+                Product.id == item.product_id
+            ).first()
+            if not product:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Product with id {item.product_id} not found"
+                )
+        db_order = crud.create_purchase_order(db, order, before_commit=store_response if idempotency_key else None)
+    except Exception:
+        if idempotency_key:
+            idempotency_crud.release_key(db, "purchase_orders", idempotency_key)
+        raise
+    if idempotency_key:
+        body = jsonable_encoder(schemas.PurchaseOrder.model_validate(db_order))
+        idempotency_crud.remember_response("purchase_orders", idempotency_key, request_hash, status.HTTP_201_CREATED, body)
+        return body
+    return db_order
 
 @router.put("/{order_id}", response_model=schemas.PurchaseOrder)
 def update_order(
@@ -1,22 +1,30 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Response, HTTPException, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from database import get_db
+from datetime import date
+import json
+import numpy as np
+from database import Base, engine, get_db, get_read_db
 import schemas.aditional_schemas as schemas
-from crud import sale_crud, product_crud
+from crud import sale_crud, product_crud, pagination, report_job_crud
+from services import analytics, report_jobs, abc_analysis, metrics_cache
+
+Base.metadata.create_all(bind=engine)
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
-@router.get("/sales", response_model=List[schemas.SalesReportItem])
-def get_sales_report(
-    start_date: str = Query(..., description="Start date for the report"),
-    end_date: str = Query(..., description="End date for the report"),
-    db: Session = Depends(get_db)
-):
-    results = sale_crud.get_sales_report(db, start_date, end_date)
+SOURCE_QUERY = Query(schemas.ReportSource.DB, description="db, or analytics to read the Parquet snapshots")
+
+def build_sales_report(db: Session, start_date, end_date, granularity: str, source: schemas.ReportSource):
+    if source == schemas.ReportSource.ANALYTICS:
+        results = analytics.get_sales_report(start_date, end_date, granularity)
+    else:
+        results = sale_crud.get_sales_report(db, start_date, end_date, granularity)
     return [
         schemas.SalesReportItem(
-            date=result.date,
+            date=pagination.as_datetime(result.period).date(),
+            period_start=pagination.as_datetime(result.period),
             total_sales=result.total_sales or 0,
             total_revenue=float(result.total_revenue or 0),
             total_products_sold=result.total_products_sold or 0
@@ -24,14 +32,11 @@ def get_sales_report(
         for result in results
     ]
 
-@router.get("/products", response_model=List[schemas.ProductReportItem])
-def get_products_report(
-    start_date: Optional[str] = Query(None, description="Start date for the report"),
-    end_date: Optional[str] = Query(None, description="End date for the report"),
-    category_id: Optional[int] = Query(None, description="Filter by category"),
-    db: Session = Depends(get_db)
-):
-    results = product_crud.get_products_report(db, start_date, end_date, category_id)
+def build_products_report(db: Session, start_date, end_date, category_id, source: schemas.ReportSource):
+    if source == schemas.ReportSource.ANALYTICS:
+        results = analytics.get_products_report(start_date, end_date, category_id)
+    else:
+        results = product_crud.get_products_report(db, start_date, end_date, category_id)
     return [
         schemas.ProductReportItem(
             product_id=result.id,
@@ -42,4 +47,196 @@ def get_products_report(
             current_stock=result.stock
         )
         for result in results
-    ]
\ No newline at end of file
+    ]
+
+def _report(response: Response, source: schemas.ReportSource, build, *args):
+    try:
+        results = build(*args)
+    except analytics.AnalyticsUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    if source == schemas.ReportSource.ANALYTICS:
+        response.headers["X-Snapshot-At"] = analytics.snapshot_time()
+    return results
+
+@router.get("/sales", response_model=List[schemas.SalesReportItem])
+def get_sales_report(
+    response: Response,
+    start_date: date = Query(..., description="Start date for the report"),
+    end_date: date = Query(..., description="End date for the report"),
+    granularity: schemas.ReportGranularity = Query(schemas.ReportGranularity.DAY, description="Period of each row"),
+    source: schemas.ReportSource = SOURCE_QUERY,
+    db: Session = Depends(get_read_db)
+):
+    return _report(response, source, build_sales_report, db, start_date, end_date, granularity.value, source)
+
+@router.get("/products", response_model=List[schemas.ProductReportItem])
+def get_products_report(
+    response: Response,
+    start_date: Optional[date] = Query(None, description="Start date for the report"),
+    end_date: Optional[date] = Query(None, description="End date for the report"),
+    category_id: Optional[int] = Query(None, description="Filter by category"),
+    source: schemas.ReportSource = SOURCE_QUERY,
+    db: Session = Depends(get_read_db)
+):
+    return _report(response, source, build_products_report, db, start_date, end_date, category_id, source)
+
+@router.get("/heatmap", response_model=schemas.SalesHeatmap)
+def get_sales_heatmap(
+    start_date: date = Query(..., alias="from", description="First day of the window"),
+    end_date: date = Query(..., alias="to", description="Last day of the window"),
+    category_id: Optional[int] = Query(None, description="Only sale lines of this category"),
+    db: Session = Depends(get_read_db)
+):
+    if start_date > end_date:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="from must not be after to")
+    return metrics_cache.sales_heatmap.get(
+        (start_date, end_date, category_id),
+        lambda: build_sales_heatmap(db, start_date, end_date, category_id)
+    )
+
+def build_sales_heatmap(db: Session, start_date, end_date, category_id=None):
+    sales = [[0] * 24 for _ in range(7)]
+    revenue = [[0.0] * 24 for _ in range(7)]
+    for result in sale_crud.get_sales_heatmap(db, start_date, end_date, category_id):
+        sales[result.weekday][result.hour] = result.total_sales
+        revenue[result.weekday][result.hour] = round(float(result.total_revenue or 0), 2)
+    return schemas.SalesHeatmap(
+        start_date=start_date,
+        end_date=end_date,
+        category_id=category_id,
+        sales=sales,
+        revenue=revenue,
+        total_sales=sum(map(sum, sales)),
+        total_revenue=round(sum(map(sum, revenue)), 2)
+    )
+
+@router.get("/abc", response_model=schemas.AbcReport)
+def get_abc_report(
+    response: Response,
+    start_date: Optional[date] = Query(None, description="Start date for the report"),
+    end_date: Optional[date] = Query(None, description="End date for the report"),
+    category_id: Optional[int] = Query(None, description="Filter by category"),
+    a_threshold: float = Query(abc_analysis.DEFAULT_A_THRESHOLD, gt=0, le=1, description="Cumulative revenue share of class A"),
+    b_threshold: float = Query(abc_analysis.DEFAULT_B_THRESHOLD, gt=0, le=1, description="Cumulative revenue share of classes A and B"),
+    abc_class: Optional[str] = Query(None, pattern="^[ABC]$", description="Only list the items of this class"),
+    skip: int = Query(0, ge=0, description="Items to skip, in revenue order"),
+    limit: int = Query(100, ge=1, le=10000, description="Items to return"),
+    source: schemas.ReportSource = SOURCE_QUERY,
+    db: Session = Depends(get_read_db)
+):
+    if a_threshold > b_threshold:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="a_threshold must not be greater than b_threshold"
+        )
+    if source == schemas.ReportSource.ANALYTICS:
+        get_rows = lambda: analytics.get_products_report(start_date, end_date, category_id)
+    else:
+        get_rows = lambda: product_crud.get_products_sales_rows(db, start_date, end_date, category_id)
+    # Pages of the same window share one classification of the whole catalog
+    key = (start_date, end_date, category_id, a_threshold, b_threshold, source)
+    classified = _report(response, source, lambda: metrics_cache.abc_report.get(
+        key, lambda: classify_products(get_rows(), a_threshold, b_threshold)
+    ))
+    # Already shaped as schemas.AbcReport; skip validating the items
+    return JSONResponse(
+        build_abc_report(classified, a_threshold, b_threshold, abc_class, skip, limit),
+        headers=dict(response.headers)
+    )
+
+def classify_products(rows, a_threshold: float, b_threshold: float):
+    """rows: (id, name, code, stock, total_sold, total_revenue) por producto.
+
+    Devuelve ((ids, nombres, códigos, vendidos), orden, ingresos, participación,
+    participación acumulada, clases), estos últimos de mayor a menor ingreso.
+    """
+    ids, names, codes, _, sold, revenues = zip(*rows) if rows else ((),) * 6
+    revenues = np.asarray(revenues, dtype=np.float64)
+    order, share, cumulative, classes = abc_analysis.classify(revenues, a_threshold, b_threshold)
+    return (ids, names, codes, sold), order, revenues[order], share, cumulative, classes
+
+def build_abc_report(classified, a_threshold: float, b_threshold: float, only_class: str = None, skip: int = 0, limit: int = None):
+    """Resumen por clase y la página skip/limit de los items (de only_class si se indica)"""
+    (ids, names, codes, sold), order, sorted_revenues, share, cumulative, classes = classified
+    total_revenue = float(sorted_revenues.sum())
+
+    listed = np.flatnonzero(classes == only_class) if only_class else np.arange(len(classes))
+    page = listed[skip:skip + limit if limit is not None else None]
+    items = [
+        {
+            'product_id': ids[index],
+            'product_name': names[index],
+            'product_code': codes[index],
+            'total_sold': int(sold[index] or 0),
+            'total_revenue': revenue,
+            'revenue_share': product_share,
+            'cumulative_share': cumulative_share,
+            'abc_class': abc_class
+        }
+        for index, revenue, product_share, cumulative_share, abc_class in zip(
+            order[page].tolist(),
+            np.round(sorted_revenues[page], 2).tolist(),
+            np.round(share[page], 6).tolist(),
+            np.round(cumulative[page], 6).tolist(),
+            classes[page].tolist()
+        )
+    ]
+    summary = []
+    for abc_class in ('A', 'B', 'C'):
+        in_class = classes == abc_class
+        class_revenue = float(sorted_revenues[in_class].sum())
+        summary.append({
+            'abc_class': abc_class,
+            'products': int(in_class.sum()),
+            'total_revenue': class_revenue,
+            'revenue_share': class_revenue / total_revenue if total_revenue else 0.0
+        })
+    return {
+        'thresholds': {'a': a_threshold, 'b': b_threshold},
+        'total_revenue': total_revenue,
+        'classes': summary,
+        'total_items': len(listed),
+        'items': items
+    }
+
+def _job_runner(job: schemas.ReportJobCreate):
+    """Función que calcula el reporte del job y devuelve filas JSON"""
+    if job.report == schemas.ReportType.SALES:
+        build = lambda db: build_sales_report(db, job.start_date, job.end_date, job.granularity.value, job.source)
+    else:
+        build = lambda db: build_products_report(db, job.start_date, job.end_date, job.category_id, job.source)
+    return lambda db: [item.model_dump(mode='json') for item in build(db)]
+
+def _job_response(job):
+    return schemas.ReportJob(
+        id=job.id,
+        report=job.report,
+        status=job.status,
+        params=json.loads(job.params),
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        error=job.error,
+        result=json.loads(job.result) if job.result else None
+    )
+
+@router.post("/jobs", response_model=schemas.ReportJob, status_code=status.HTTP_202_ACCEPTED)
+def create_report_job(job: schemas.ReportJobCreate, db: Session = Depends(get_db)):
+    if job.report == schemas.ReportType.SALES and not (job.start_date and job.end_date):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="start_date and end_date are required for the sales report"
+        )
+    params = job.model_dump(mode='json', exclude={'report'})
+    db_job, created = report_job_crud.get_or_create_job(db, job.report.value, params, report_jobs.is_pending)
+    if created:
+        report_jobs.submit(db_job.id, _job_runner(job))
+    return _job_response(db_job)
+
+@router.get("/jobs/{job_id}", response_model=schemas.ReportJob)
+def read_report_job(job_id: str, db: Session = Depends(get_db)):
+    # Primary: a replica may not have the job row or its latest status yet
+    db_job = report_job_crud.get_job(db, job_id)
+    if db_job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Report job not found")
+    return _job_response(db_job)
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from crud import sale_detail_crud as crud
 from schemas import sale_detail_schema as schemas
-from database import Base, engine, get_db
+from database import Base, engine, get_db, get_read_db
 from typing import List
 from models.sale import Sale
 from models.product import Product
@@ -17,11 +17,11 @@ router = APIRouter(
 )
 
 @router.get("/sale/{sale_id}", response_model=List[schemas.SaleDetail])
-def read_sale_details(sale_id: int, db: Session = Depends(get_db)):
+def read_sale_details(sale_id: int, db: Session = Depends(get_read_db)):
     return crud.get_sale_details(db, sale_id)
 
 @router.get("/{detail_id}", response_model=schemas.SaleDetail)
-def read_sale_detail(detail_id: int, db: Session = Depends(get_db)):
+def read_sale_detail(detail_id: int, db: Session = Depends(get_read_db)):
     db_detail = crud.get_sale_detail(db, detail_id)
     if not db_detail:
         raise HTTPException(
@@ -1,22 +1,88 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from models.sale import Sale
 import crud.sale_crud as crud
+import crud.idempotency_crud as idempotency_crud
+from crud import pagination, daily_summary_crud
 from schemas import sale_schema as schemas
-from database import Base, engine, get_db
-from typing import List
-from datetime import datetime
+from database import Base, engine, read_session, get_db, get_read_db, get_async_db, USE_ASYNC_DB
+from typing import List, Optional
+from datetime import datetime, date
+import csv
+import io
+import json
+from services import metrics_cache
 
 Base.metadata.create_all(bind=engine)
 
 router = APIRouter(prefix="/sales", tags=["sales"])
 
 @router.get("/", response_model=List[schemas.Sale])
-def read_sales(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_sales(db, skip=skip, limit=limit)
+def read_sales(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    payment_method: Optional[schemas.PaymentMethod] = None,
+    db: Session = Depends(get_read_db)
+):
+    try:
+        sales = crud.get_sales(
+            db, skip=skip, limit=limit, cursor=cursor,
+            date_from=date_from, date_to=date_to, payment_method=payment_method
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if len(sales) == limit:
+        response.headers["X-Next-Cursor"] = pagination.encode_cursor(sales[-1].fecha, sales[-1].id)
+    return sales
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, (datetime, date)) else str(value)
+
+def _export_rows(export_format: str, date_from, date_to):
+    # Own session: the response body is streamed after the route returns
+    db = read_session()
+    try:
+        rows = crud.iter_sale_lines(db, date_from, date_to)
+        buffer = io.StringIO()
+        if export_format == "csv":
+            writer = csv.writer(buffer)
+            writer.writerow(crud.EXPORT_COLUMNS)
+        for count, row in enumerate(rows, start=1):
+            if export_format == "csv":
+                writer.writerow(row)
+            else:
+                buffer.write(json.dumps(dict(zip(crud.EXPORT_COLUMNS, row)), default=_json_value))
+                buffer.write("\n")
+            if count % 1000 == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    finally:
+        db.close()
+
+@router.get("/export")
+def export_sales(
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to")
+):
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _export_rows(export_format, date_from, date_to),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=sales.{export_format}"}
+    )
 
 @router.get("/{sale_id}", response_model=schemas.Sale)
-def read_sale(sale_id: int, db: Session = Depends(get_db)):
+def read_sale(sale_id: int, db: Session = Depends(get_read_db)):
     db_sale = crud.get_sale(db, sale_id)
     if not db_sale:
         raise HTTPException(
@@ -25,17 +91,65 @@ def read_sale(sale_id: int, db: Session = Depends(get_db)):
         )
     return db_sale
 
-@router.post("/", response_model=schemas.Sale, status_code=status.HTTP_201_CREATED)
-def create_sale(sale: schemas.SaleCreate, db: Session = Depends(get_db)):
+def create_sale_with_idempotency(db: Session, sale: schemas.SaleCreate, idempotency_key: Optional[str]):
+    # Shared by the sync route and the async one (through run_sync)
+    if idempotency_key:
+        request_hash = idempotency_crud.hash_request(jsonable_encoder(sale))
+        stored, error = idempotency_crud.reserve_key(db, "sales", idempotency_key, request_hash)
+        if error:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=error)
+        if stored:
+            return JSONResponse(status_code=stored[0], content=stored[1])
+    def store_response(db: Session, sale_id: int):
+        body = jsonable_encoder(schemas.Sale.model_validate(crud.get_sale(db, sale_id)))
+        idempotency_crud.record_response(db, "sales", idempotency_key, status.HTTP_201_CREATED, body)
+    
     try:
-        return crud.create_sale_with_details(db, sale)
+        db_sale = crud.create_sale_with_details(db, sale, before_commit=store_response if idempotency_key else None)
     except HTTPException:
+        if idempotency_key:
+            idempotency_crud.release_key(db, "sales", idempotency_key)
         raise
     except Exception as e:
+        if idempotency_key:
+            idempotency_crud.release_key(db, "sales", idempotency_key)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error creating sale: {str(e)}"
         )
+    if idempotency_key:
+        body = jsonable_encoder(schemas.Sale.model_validate(db_sale))
+        idempotency_crud.remember_response("sales", idempotency_key, request_hash, status.HTTP_201_CREATED, body)
+        return body
+    return db_sale
+
+if USE_ASYNC_DB:
+    @router.post("/", response_model=schemas.Sale, status_code=status.HTTP_201_CREATED)
+    async def create_sale(
+        sale: schemas.SaleCreate,
+        idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+        db: AsyncSession = Depends(get_async_db)
+    ):
+        # The returned sale is fully loaded, so it can be serialized outside the greenlet
+        return await db.run_sync(create_sale_with_idempotency, sale, idempotency_key)
+else:
+    @router.post("/", response_model=schemas.Sale, status_code=status.HTTP_201_CREATED)
+    def create_sale(
+        sale: schemas.SaleCreate,
+        idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+        db: Session = Depends(get_db)
+    ):
+        return create_sale_with_idempotency(db, sale, idempotency_key)
+
+@router.post("/batch", response_model=schemas.SaleBatchResponse)
+def create_sales_batch(batch: schemas.SaleBatchCreate, db: Session = Depends(get_db)):
+    results = crud.create_sales_batch(db, batch.sales)
+    created = sum(1 for result in results if result['status'] == 'created')
+    return schemas.SaleBatchResponse(
+        created=created,
+        failed=len(results) - created,
+        results=results
+    )
 
 @router.put("/{sale_id}", response_model=schemas.Sale)
 def update_sale(
@@ -75,5 +189,10 @@ def seed_sales(db: Session = Depends(get_db)):
         )
         db.add(sale)
         sales.append(sale)
+    # Seeded sales have no lines; only the per-day summary gets them
+    daily_summary_crud.record_sales(db, [(sale.fecha, sale.total, 0, 0) for sale in sales])
     db.commit()
+    metrics_cache.dashboard_metrics.invalidate()
+    metrics_cache.sales_heatmap.invalidate()
+    metrics_cache.abc_report.invalidate()
     return {"message": "10 sales seeded"}
\ No newline at end of file
@@ -8,6 +8,7 @@ from models.purchase_order_detail import PurchaseOrderDetail
 from models.sale import Sale
 from models.sale_detail import SaleDetail
 from database import get_db
+from crud import daily_summary_crud, stock_ledger_crud
 from datetime import datetime
 
 router = APIRouter(prefix="/seed", tags=["seed"])
@@ -85,9 +86,13 @@ def seed_all(db: Session = Depends(get_db)):
         {"code": "P010", "name": "Pollo entero 2kg", "price": 9.00, "stock": 35, "min_stock": 5,
          "category_id": categories_db[1].id, "supplier_id": suppliers_db[3].id, "is_active": True},  # Carnes y Más
     ]
+    added = []
     for prod in products:
         if not db.query(Product).filter(Product.code == prod["code"]).first():
-            db.add(Product(**prod))
+            added.append(Product(**prod))
+    db.add_all(added)
+    db.flush()
+    stock_ledger_crud.record_opening_stock(db, added)
     db.commit()
     products_db = db.query(Product).all()
 
@@ -232,4 +237,8 @@ def seed_all(db: Session = Depends(get_db)):
         db.add(detail)
     db.commit()
 
+    # 9. Resúmenes diarios
+    daily_summary_crud.rebuild_daily_summaries(db)
+    daily_summary_crud.rebuild_product_daily_sales(db)
+
     return {"message": "Datos reales de ejemplo creados correctamente en todas las tablas."}
\ No newline at end of file
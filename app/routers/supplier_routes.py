@@ -3,17 +3,17 @@ from sqlalchemy.orm import Session
 from models.supplier import Supplier
 import schemas.supplier_schema as schemas
 import crud.supplier_crud as crud
-from database import get_db
+from database import get_db, get_read_db
 from typing import List
 
 router = APIRouter(prefix="/suppliers", tags=["suppliers"])
 
 @router.get("/", response_model=List[schemas.Supplier])
-def read_suppliers(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_suppliers(skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)):
     return crud.get_suppliers(db, skip=skip, limit=limit)
 
 @router.get("/{supplier_id}", response_model=schemas.Supplier)
-def read_supplier(supplier_id: int, db: Session = Depends(get_db)):
+def read_supplier(supplier_id: int, db: Session = Depends(get_read_db)):
     db_supplier = crud.get_supplier(db, supplier_id)
     if not db_supplier:
         raise HTTPException(
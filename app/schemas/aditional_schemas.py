@@ -1,6 +1,6 @@
 from pydantic import BaseModel, validator
 from datetime import datetime, date
-from typing import Optional, List
+from typing import Optional, List, Any
 from enum import Enum
 
 class MovementType(str, Enum):
@@ -16,6 +16,15 @@ class DashboardMetrics(BaseModel):
     total_products: int
     low_stock_count: int
 
+class CacheStats(BaseModel):
+    hits: int
+    misses: int
+    invalidations: int
+    hit_ratio: float
+    max_age_seconds: float
+    entries: int = 0  # fresh cached keys
+    age_seconds: Optional[float] = None
+
 class BestSellingProduct(BaseModel):
     product_id: int
     product_name: str
@@ -24,12 +33,83 @@ class BestSellingProduct(BaseModel):
     total_revenue: float
 
 # Report Schemas
+class ReportGranularity(str, Enum):
+    HOUR = "hour"
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+class ReportSource(str, Enum):
+    DB = "db"
+    ANALYTICS = "analytics"  # Parquet snapshots, see services/analytics.py
+
+class ReportType(str, Enum):
+    SALES = "sales"
+    PRODUCTS = "products"
+
+class ReportJobCreate(BaseModel):
+    report: ReportType
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    granularity: ReportGranularity = ReportGranularity.DAY  # sales only
+    category_id: Optional[int] = None  # products only
+    source: ReportSource = ReportSource.DB
+
+class ReportJob(BaseModel):
+    id: str
+    report: ReportType
+    status: str  # queued, running, done, failed
+    params: dict
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    result: Optional[List[Any]] = None
+
 class SalesReportItem(BaseModel):
     date: date
+    period_start: datetime
     total_sales: int
     total_revenue: float
     total_products_sold: int
 
+# Sales by weekday and hour; matrices are [weekday][hour], weekday 0 = Monday
+class SalesHeatmap(BaseModel):
+    start_date: date
+    end_date: date
+    category_id: Optional[int] = None
+    sales: List[List[int]]
+    revenue: List[List[float]]
+    total_sales: int
+    total_revenue: float
+
+class AbcThresholds(BaseModel):
+    a: float  # cumulative revenue share closed by class A
+    b: float  # ... by classes A and B
+
+class AbcClassSummary(BaseModel):
+    abc_class: str
+    products: int
+    total_revenue: float
+    revenue_share: float
+
+class AbcItem(BaseModel):
+    product_id: int
+    product_name: str
+    product_code: str
+    total_sold: int
+    total_revenue: float
+    revenue_share: float
+    cumulative_share: float
+    abc_class: str
+
+class AbcReport(BaseModel):
+    thresholds: AbcThresholds
+    total_revenue: float
+    classes: List[AbcClassSummary]
+    total_items: int  # items of the requested class (all classes by default), across pages
+    items: List[AbcItem]
+
 class ProductReportItem(BaseModel):
     product_id: int
     product_name: str
@@ -45,4 +125,39 @@ class LowStockItem(BaseModel):
     product_name: str
     current_stock: int
     min_stock: int
-    supplier_name: Optional[str] = None
\ No newline at end of file
+    supplier_name: Optional[str] = None
+# min_stock recommended from the demand forecast
+class StockRecommendation(BaseModel):
+    product_id: int
+    product_code: str
+    product_name: str
+    current_stock: int
+    min_stock: int
+    recommended_min_stock: int
+    avg_daily_demand: float
+    demand_std: float
+    safety_stock: int
+    window_days: int
+    lead_time_days: float
+    computed_at: datetime
+    applied_at: Optional[datetime] = None
+
+# Stock of a product at the close of a past day (GET /inventory/stock-at)
+class StockAtItem(BaseModel):
+    product_id: int
+    product_code: str
+    product_name: str
+    is_active: bool
+    stock: int
+
+# One purchase order created by POST /inventory/restock/bulk
+class BulkRestockOrder(BaseModel):
+    order_id: int
+    order_number: str
+    supplier_id: int
+    lines: int
+    total_amount: float
+
+class BulkRestockResult(BaseModel):
+    orders: List[BulkRestockOrder]
+    skipped_without_supplier: List[int]  # low-stock product ids with no supplier
@@ -23,10 +23,32 @@ class SaleCreate(SaleBase):
 
 class Sale(SaleBase):
     id: int
+    receipt_number: Optional[str] = None
     fecha: datetime
     total: float
     created_at: datetime
     sale_details: List[SaleDetail]
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# Batch ingestion Schemas
+class OfflineSaleCreate(SaleCreate):
+    fecha: Optional[datetime] = None  # Original time recorded by the terminal
+
+class SaleBatchCreate(BaseModel):
+    sales: List[OfflineSaleCreate]
+
+class SaleBatchResult(BaseModel):
+    index: int
+    status: str  # created, failed
+    sale_id: Optional[int] = None
+    receipt_number: Optional[str] = None
+    total: Optional[float] = None
+    error: Optional[str] = None
+    failed_items: Optional[List[dict]] = None
+
+class SaleBatchResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[SaleBatchResult]
@@ -0,0 +1,33 @@
+"""ABC (Pareto) classification of products by revenue contribution."""
+import numpy as np
+
+DEFAULT_A_THRESHOLD = 0.80
+DEFAULT_B_THRESHOLD = 0.95
+
+def classify(revenues, a_threshold: float = DEFAULT_A_THRESHOLD, b_threshold: float = DEFAULT_B_THRESHOLD):
+    """Clasifica por aporte acumulado a los ingresos.
+
+    Con los productos ordenados por ingresos descendentes, un producto es A
+    si el acumulado antes de él está por debajo de a_threshold (el que cruza
+    el umbral también es A), B si está por debajo de b_threshold, y C el
+    resto, incluidos los que no vendieron.
+
+    Devuelve (orden, participación, participación acumulada, clases), todos
+    como arrays en el orden de mayor a menor ingreso.
+    """
+    revenues = np.asarray(revenues, dtype=np.float64)
+    order = np.argsort(-revenues, kind='stable')
+    sorted_revenues = revenues[order]
+    total = sorted_revenues.sum()
+    if total > 0:
+        share = sorted_revenues / total
+    else:
+        share = np.zeros_like(sorted_revenues)
+    cumulative = np.cumsum(share)
+    preceding = cumulative - share
+    classes = np.select(
+        [(sorted_revenues > 0) & (preceding < a_threshold), (sorted_revenues > 0) & (preceding < b_threshold)],
+        ['A', 'B'],
+        default='C'
+    )
+    return order, share, cumulative, classes
@@ -0,0 +1,115 @@
+"""Reports answered by DuckDB from the Parquet snapshots (source=analytics).
+
+Queries never touch the OLTP database, so they reflect the last snapshot
+written by jobs.snapshot_analytics.
+"""
+from collections import namedtuple
+
+import duckdb
+import pyarrow as pa
+
+from crud import pagination
+from services import analytics_snapshot
+
+class AnalyticsUnavailable(Exception):
+    pass
+
+def snapshot_time():
+    """Momento del último snapshot (ISO), o None si no hay ninguno"""
+    state = analytics_snapshot.load_state()
+    return state['snapshot_at'] if state else None
+
+def _connect():
+    # One read of the manifest: every view points at the same snapshot
+    state = analytics_snapshot.load_state()
+    if state is None:
+        raise AnalyticsUnavailable("No analytics snapshot yet; run python -m jobs.snapshot_analytics")
+    con = duckdb.connect()
+    for table, schema in analytics_snapshot.SCHEMAS.items():
+        files = analytics_snapshot.snapshot_files(state, table)
+        options = "" if table == 'products' else ", hive_partitioning = true, hive_types = {'month': VARCHAR}"
+        if files:
+            paths = ", ".join("'" + path.replace("'", "''") + "'" for path in files)
+            con.execute(f"CREATE VIEW {table} AS SELECT * FROM read_parquet([{paths}]{options})")
+        else:
+            if table != 'products':
+                schema = schema.append(pa.field('month', pa.string()))
+            con.register(table, schema.empty_table())
+    return con
+
+def _rows(cursor):
+    Row = namedtuple('Row', [column[0] for column in cursor.description])
+    return [Row(*values) for values in cursor.fetchall()]
+
+def _month_range(start, end):
+    # Partition bounds as 'YYYY-MM' strings; end is exclusive
+    return start.strftime('%Y-%m'), end.strftime('%Y-%m')
+
+def get_sales_report(start_date, end_date, granularity: str = 'day'):
+    """Mismo resultado que sale_crud.get_sales_report"""
+    if granularity not in pagination.REPORT_GRANULARITIES:
+        raise ValueError(f"Invalid granularity: {granularity}")
+    start, end = pagination.day_range(start_date, end_date)
+    first_month, last_month = _month_range(start, end)
+    con = _connect()
+    try:
+        # Separate aggregates for sales and lines, as in sale_crud.build_sales_report
+        return _rows(con.execute(f"""
+            WITH sales_per_period AS (
+                SELECT date_trunc('{granularity}', fecha) AS period,
+                       count(*) AS total_sales, sum(total) AS total_revenue
+                FROM sales
+                WHERE fecha >= $start AND fecha < $end
+                  AND month >= $first_month AND month <= $last_month
+                GROUP BY 1
+            ), lines_per_period AS (
+                SELECT date_trunc('{granularity}', sale_fecha) AS period,
+                       sum(quantity) AS total_products_sold
+                FROM sale_details
+                WHERE sale_fecha >= $start AND sale_fecha < $end
+                  AND month >= $first_month AND month <= $last_month
+                GROUP BY 1
+            )
+            SELECT s.period, s.total_sales, s.total_revenue,
+                   coalesce(l.total_products_sold, 0) AS total_products_sold
+            FROM sales_per_period s
+            LEFT JOIN lines_per_period l USING (period)
+            ORDER BY s.period DESC
+        """, {'start': start, 'end': end, 'first_month': first_month, 'last_month': last_month}))
+    finally:
+        con.close()
+
+def get_products_report(start_date=None, end_date=None, category_id=None):
+    """Mismo resultado que product_crud.get_products_report"""
+    start, end = pagination.day_range(start_date, end_date)
+    filters = []
+    params = {}
+    if start:
+        filters.append("sale_fecha >= $start AND month >= $first_month")
+        params.update(start=start, first_month=start.strftime('%Y-%m'))
+    if end:
+        filters.append("sale_fecha < $end AND month <= $last_month")
+        params.update(end=end, last_month=end.strftime('%Y-%m'))
+    product_filter = "p.is_active"
+    if category_id:
+        product_filter += " AND p.category_id = $category_id"
+        params['category_id'] = category_id
+    con = _connect()
+    try:
+        return _rows(con.execute(f"""
+            WITH sold AS (
+                SELECT product_id, sum(quantity) AS total_sold, sum(subtotal) AS total_revenue
+                FROM sale_details
+                {'WHERE ' + ' AND '.join(filters) if filters else ''}
+                GROUP BY product_id
+            )
+            SELECT p.id, p.name, p.code, p.stock,
+                   coalesce(sold.total_sold, 0) AS total_sold,
+                   coalesce(sold.total_revenue, 0) AS total_revenue
+            FROM products p
+            LEFT JOIN sold ON sold.product_id = p.id
+            WHERE {product_filter}
+            ORDER BY total_sold DESC, p.id
+        """, params))
+    finally:
+        con.close()
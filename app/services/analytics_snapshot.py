@@ -0,0 +1,254 @@
+"""Incremental Parquet snapshots of the sales history for the analytics engine.
+
+Layout under config.ANALYTICS_DIR:
+
+    sales/month=YYYY-MM/part-<run>-<first id>-<last id>.parquet
+    sale_details/month=YYYY-MM/...        (partitioned by the sale date)
+    inventory_movements/month=YYYY-MM/...
+    products/products-<run>.parquet       (rewritten on every run)
+    _state.json                           (manifest: files of the snapshot,
+                                           last exported id per table)
+
+New rows are exported by id. Each run also rewrites the month partitions
+that overlap the last reexport_days days, picking up recent sales that were
+edited or deleted and rows whose transaction committed after the settle
+wait. Older changes stay as they were until a full snapshot (full=True).
+
+A run never touches the files of the current snapshot: it writes new ones
+and then replaces _state.json atomically. Readers only open the files the
+manifest lists, so they see one whole snapshot; files it no longer lists
+are deleted ANALYTICS_RETIRED_GRACE_SECONDS later.
+"""
+from datetime import datetime, timedelta
+import json
+import os
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import select, func
+
+from config import ANALYTICS_DIR, ANALYTICS_REEXPORT_DAYS, ANALYTICS_RETIRED_GRACE_SECONDS
+from models.sale import Sale
+from models.sale_detail import SaleDetail
+from models.inventory_movement import InventoryMovement
+from models.product import Product
+
+BATCH_SIZE = 50_000
+
+SCHEMAS = {
+    'sales': pa.schema([
+        ('id', pa.int64()),
+        ('fecha', pa.timestamp('us')),
+        ('total', pa.float64()),
+        ('tax_amount', pa.float64()),
+        ('discount_amount', pa.float64()),
+        ('payment_method', pa.string()),
+    ]),
+    'sale_details': pa.schema([
+        ('id', pa.int64()),
+        ('sale_id', pa.int64()),
+        ('product_id', pa.int64()),
+        ('quantity', pa.int64()),
+        ('unit_price', pa.float64()),
+        ('subtotal', pa.float64()),
+        ('sale_fecha', pa.timestamp('us')),
+    ]),
+    'inventory_movements': pa.schema([
+        ('id', pa.int64()),
+        ('product_id', pa.int64()),
+        ('movement_type', pa.string()),
+        ('quantity', pa.int64()),
+        ('reference_type', pa.string()),
+        ('reference_id', pa.int64()),
+        ('movement_date', pa.timestamp('us')),
+        ('previous_stock', pa.int64()),
+        ('new_stock', pa.int64()),
+    ]),
+    'products': pa.schema([
+        ('id', pa.int64()),
+        ('code', pa.string()),
+        ('name', pa.string()),
+        ('price', pa.float64()),
+        ('stock', pa.int64()),
+        ('min_stock', pa.int64()),
+        ('category_id', pa.int64()),
+        ('supplier_id', pa.int64()),
+        ('is_active', pa.bool_()),
+    ]),
+}
+
+# Exported by id: (id column, partition date field, its column, select of the exported columns)
+INCREMENTAL_TABLES = {
+    'sales': (Sale.id, 'fecha', Sale.fecha, select(
+        Sale.id, Sale.fecha, Sale.total, Sale.tax_amount, Sale.discount_amount, Sale.payment_method
+    )),
+    'sale_details': (SaleDetail.id, 'sale_fecha', Sale.fecha, select(
+        SaleDetail.id, SaleDetail.sale_id, SaleDetail.product_id, SaleDetail.quantity,
+        SaleDetail.unit_price, SaleDetail.subtotal, Sale.fecha.label('sale_fecha')
+    ).join(Sale, SaleDetail.sale_id == Sale.id)),
+    'inventory_movements': (InventoryMovement.id, 'movement_date', InventoryMovement.movement_date, select(
+        InventoryMovement.id, InventoryMovement.product_id, InventoryMovement.movement_type,
+        InventoryMovement.quantity, InventoryMovement.reference_type, InventoryMovement.reference_id,
+        InventoryMovement.movement_date, InventoryMovement.previous_stock, InventoryMovement.new_stock
+    )),
+}
+
+def table_dir(table: str, base_dir: str = None):
+    return os.path.join(base_dir or ANALYTICS_DIR, table)
+
+def state_path(base_dir: str = None):
+    return os.path.join(base_dir or ANALYTICS_DIR, '_state.json')
+
+def load_state(base_dir: str = None):
+    """Manifiesto del último snapshot, o None si nunca se ejecutó"""
+    try:
+        with open(state_path(base_dir)) as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    # Written before snapshots had a manifest: take a full one next time
+    return state if 'files' in state else None
+
+def snapshot_files(state: dict, table: str, base_dir: str = None):
+    """Rutas absolutas de los archivos de table en el snapshot de state"""
+    root = base_dir or ANALYTICS_DIR
+    return [os.path.join(root, path) for path in state['files'][table]]
+
+def _write_atomic(table: pa.Table, path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+def _save_state(state: dict, base_dir: str = None):
+    path = state_path(base_dir)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+def _drop_retired_files(keep: set, base_dir: str = None):
+    """Borra los archivos que el manifiesto ya no lista una vez pasado el
+    margen para las consultas que aún los leen (y restos de pasadas
+    interrumpidas)"""
+    root = base_dir or ANALYTICS_DIR
+    limit = time.time() - ANALYTICS_RETIRED_GRACE_SECONDS
+    for table in list(INCREMENTAL_TABLES) + ['products']:
+        for directory, _, names in os.walk(table_dir(table, base_dir)):
+            for name in names:
+                path = os.path.join(directory, name)
+                if os.path.relpath(path, root) not in keep and os.path.getmtime(path) < limit:
+                    os.remove(path)
+
+def _retire(paths, base_dir: str = None):
+    # The grace period counts from when a file leaves the manifest
+    root = base_dir or ANALYTICS_DIR
+    for path in paths:
+        try:
+            os.utime(os.path.join(root, path))
+        except FileNotFoundError:
+            pass
+
+def _export_rows(db, table: str, low_id: int, high_id: int, run: str, base_dir: str = None, since=None, before=None):
+    """Exporta las filas con low_id < id <= high_id, opcionalmente solo las
+    con fecha desde since o antes de before. Devuelve (filas, archivos
+    escritos, relativos a ANALYTICS_DIR)."""
+    id_column, date_field, date_column, query = INCREMENTAL_TABLES[table]
+    query = query.where(id_column > low_id, id_column <= high_id)
+    if since:
+        query = query.where(date_column >= since)
+    if before:
+        query = query.where(date_column < before)
+    result = db.execute(query.order_by(id_column).execution_options(yield_per=BATCH_SIZE))
+    exported = 0
+    written = []
+    for rows in result.mappings().partitions():
+        per_month = {}
+        for row in rows:
+            per_month.setdefault(row[date_field].strftime('%Y-%m'), []).append(row)
+        for month, month_rows in per_month.items():
+            path = os.path.join(
+                table, f"month={month}",
+                f"part-{run}-{month_rows[0]['id']}-{month_rows[-1]['id']}.parquet"
+            )
+            _write_atomic(
+                pa.Table.from_pylist([dict(row) for row in month_rows], SCHEMAS[table]),
+                os.path.join(base_dir or ANALYTICS_DIR, path)
+            )
+            written.append(path)
+        exported += len(rows)
+    return exported, written
+
+def _export_products(db, run: str, base_dir: str = None):
+    rows = db.execute(select(
+        Product.id, Product.code, Product.name, Product.price, Product.stock,
+        Product.min_stock, Product.category_id, Product.supplier_id, Product.is_active
+    )).mappings().all()
+    path = os.path.join('products', f"products-{run}.parquet")
+    _write_atomic(
+        pa.Table.from_pylist([dict(row) for row in rows], SCHEMAS['products']),
+        os.path.join(base_dir or ANALYTICS_DIR, path)
+    )
+    return len(rows), path
+
+def take_snapshot(
+    db, full: bool = False, settle_seconds: float = 10, base_dir: str = None,
+    reexport_days: int = ANALYTICS_REEXPORT_DAYS
+):
+    """Exporta a Parquet las filas nuevas desde el último snapshot.
+
+    Lee los ids máximos, espera settle_seconds para que confirmen las
+    transacciones que tenían ids menores en curso, y exporta hasta esos ids.
+    Los meses que tocan los últimos reexport_days días se reescriben
+    completos. El snapshot anterior sigue legible hasta que se publica el
+    manifiesto nuevo. Devuelve el número de filas exportadas por tabla.
+    """
+    current = load_state(base_dir)
+    previous = None if full else current
+    if previous is None:
+        previous = {
+            'watermarks': {table: 0 for table in INCREMENTAL_TABLES},
+            'files': {table: [] for table in list(INCREMENTAL_TABLES) + ['products']}
+        }
+    watermarks = dict(previous['watermarks'])
+    files = {table: list(paths) for table, paths in previous['files'].items()}
+
+    high_ids = {
+        table: db.execute(select(func.coalesce(func.max(id_column), 0))).scalar()
+        for table, (id_column, _, _, _) in INCREMENTAL_TABLES.items()
+    }
+    db.rollback()  # don't hold a transaction open while settling
+    if settle_seconds:
+        time.sleep(settle_seconds)
+
+    snapshot_at = datetime.now()
+    run = snapshot_at.strftime('%Y%m%d%H%M%S%f')
+    window_start = None
+    if not full and reexport_days:
+        window_start = (snapshot_at - timedelta(days=reexport_days)).replace(
+            day=1, hour=0, minute=0, second=0, microsecond=0
+        )
+    exported = {}
+    for table in INCREMENTAL_TABLES:
+        exported[table], written = _export_rows(
+            db, table, watermarks[table], high_ids[table], run, base_dir, before=window_start
+        )
+        files[table] += written
+        if window_start:
+            # Replace every file of the re-exported months
+            recent_months = f"month={window_start:%Y-%m}"
+            kept = [path for path in files[table] if path.split(os.sep)[1] < recent_months]
+            recent, written = _export_rows(db, table, 0, high_ids[table], run, base_dir, since=window_start)
+            files[table] = kept + written
+            exported[table] += recent
+        watermarks[table] = max(watermarks[table], high_ids[table])
+    exported['products'], products_path = _export_products(db, run, base_dir)
+    files['products'] = [products_path]
+    db.rollback()
+
+    _save_state({'snapshot_at': snapshot_at.isoformat(), 'watermarks': watermarks, 'files': files}, base_dir)
+    keep = {path for paths in files.values() for path in paths}
+    if current:
+        _retire([path for paths in current['files'].values() for path in paths if path not in keep], base_dir)
+    _drop_retired_files(keep, base_dir)
+    return exported
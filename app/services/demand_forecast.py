@@ -0,0 +1,26 @@
+"""Daily demand statistics and reorder points for the whole catalog at once."""
+import numpy as np
+
+def reorder_points(total_units, total_squares, observed_days, lead_time_days: float, service_z: float):
+    """Punto de pedido por producto a partir de su demanda diaria.
+
+    total_units y total_squares son la suma de unidades vendidas por día y la
+    suma de sus cuadrados; los días sin ventas cuentan como cero dentro de
+    observed_days. Devuelve (demanda media, desviación, stock de seguridad,
+    punto de pedido) como arrays; el punto de pedido es
+    ceil(media * plazo + z * desviación * sqrt(plazo)).
+    """
+    total_units = np.asarray(total_units, dtype=np.float64)
+    total_squares = np.asarray(total_squares, dtype=np.float64)
+    observed_days = np.maximum(np.asarray(observed_days, dtype=np.float64), 1)
+    mean = total_units / observed_days
+    # Sample variance from the sums; clip rounding noise below zero
+    variance = np.where(
+        observed_days > 1,
+        (total_squares - observed_days * mean ** 2) / np.maximum(observed_days - 1, 1),
+        0.0
+    )
+    std = np.sqrt(np.clip(variance, 0, None))
+    safety_stock = np.ceil(service_z * std * np.sqrt(lead_time_days))
+    reorder_point = np.ceil(mean * lead_time_days + safety_stock)
+    return mean, std, safety_stock.astype(np.int64), reorder_point.astype(np.int64)
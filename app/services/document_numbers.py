@@ -0,0 +1,115 @@
+"""Document numbers (PO, RST, REC) served from blocks each worker reserves in the database."""
+from collections import deque
+import threading
+from sqlalchemy import select, insert, update, func, text
+from sqlalchemy.exc import IntegrityError
+import config
+import database
+from models.document_counter import DocumentCounter, DOCUMENT_SEQUENCES
+
+class DocumentNumbers:
+    """Entrega números consecutivos por prefijo sin consultar la base en el caso común.
+
+    Cada worker reserva bloques de block_size números: en PostgreSQL con un
+    nextval sobre la secuencia del prefijo (su INCREMENT BY es el tamaño del
+    bloque), en otras bases sumando al contador de document_counters en su
+    propia transacción. Los bloques no se solapan entre workers, así que los
+    números no se repiten; los que un worker no llega a usar quedan como
+    huecos en la numeración. El lock solo cubre el reparto de bloques ya
+    reservados; la reserva en la base se hace fuera de él.
+    """
+
+    def __init__(self, bind, block_size: int):
+        self.bind = bind
+        self.block_size = block_size
+        self.reservations = 0
+        self._lock = threading.Lock()
+        self._free = {}  # prefix -> deque of reserved ranges not handed out yet
+        self._increments = {}  # sequence name -> INCREMENT BY read from the database
+
+    def take(self, prefix: str, count: int = 1, conn=None):
+        """Devuelve count números nuevos para prefix, reservando bloques si faltan.
+
+        En PostgreSQL la reserva usa conn, la conexión del llamador, si se
+        pasa: así no pide otra al pool mientras retiene la suya y sus bloqueos.
+        """
+        if prefix not in DOCUMENT_SEQUENCES:
+            raise ValueError(f"Unknown document prefix {prefix}")
+        blocks = []
+        while True:
+            with self._lock:
+                free = self._free.setdefault(prefix, deque())
+                if blocks:
+                    self.reservations += 1
+                    free.extend(blocks)
+                missing = count - sum(len(block) for block in free)
+                if missing <= 0:
+                    return self._hand_out(free, count)
+            # Database I/O outside the lock; whoever empties the blocks first
+            # just makes this loop reserve again
+            blocks = self._reserve(prefix, missing, conn)
+
+    def _hand_out(self, free: deque, count: int):
+        numbers = []
+        while len(numbers) < count:
+            needed = count - len(numbers)
+            block = free.popleft()
+            numbers.extend(block[:needed])
+            if needed < len(block):
+                free.appendleft(block[needed:])
+        return numbers
+
+    def _reserve(self, prefix: str, count: int, conn=None):
+        if self.bind.dialect.name == 'postgresql':
+            # nextval is not transactional: the block stays taken even if the
+            # caller's transaction rolls back
+            if conn is not None:
+                return self._reserve_from_sequence(conn, DOCUMENT_SEQUENCES[prefix], count)
+            with self.bind.connect() as own:
+                return self._reserve_from_sequence(own, DOCUMENT_SEQUENCES[prefix], count)
+        # Counter rows are transactional: reserve in our own transaction so a
+        # rollback of the caller's cannot hand the block out twice
+        with self.bind.begin() as own:
+            return self._reserve_from_counter(own, prefix, count)
+
+    def _reserve_from_sequence(self, conn, sequence, count: int):
+        # Trust the sequence's own step, not the config, so a changed block
+        # size can never hand out overlapping blocks
+        step = self._increments.get(sequence.name)
+        if step is None:
+            step = conn.execute(
+                text("SELECT increment_by FROM pg_sequences WHERE sequencename = :name"),
+                {"name": sequence.name}
+            ).scalar()
+            self._increments[sequence.name] = step
+        blocks = -(-count // step)
+        starts = conn.execute(
+            select(sequence.next_value()).select_from(func.generate_series(1, blocks))
+        ).scalars().all()
+        return [range(start, start + step) for start in starts]
+
+    def _reserve_from_counter(self, conn, prefix: str, count: int):
+        size = max(self.block_size, count)
+        counter = DocumentCounter
+        bump = update(counter).where(counter.prefix == prefix).values(last_value=counter.last_value + size)
+        if not conn.execute(bump).rowcount:
+            try:
+                with conn.begin_nested():
+                    conn.execute(insert(counter).values(prefix=prefix, last_value=size))
+            except IntegrityError:
+                # Another worker created the row since our update; take the next block
+                conn.execute(bump)
+        last_value = conn.execute(select(counter.last_value).where(counter.prefix == prefix)).scalar()
+        return [range(last_value - size + 1, last_value + 1)]
+
+def format_number(prefix: str, number: int):
+    return f"{prefix}-{number:08d}"
+
+allocator = DocumentNumbers(database.engine, config.DOCUMENT_NUMBER_BLOCK_SIZE)
+
+def next_number(prefix: str, conn=None):
+    """Siguiente número de documento, p. ej. PO-00000042"""
+    return next_numbers(prefix, 1, conn)[0]
+
+def next_numbers(prefix: str, count: int, conn=None):
+    return [format_number(prefix, number) for number in allocator.take(prefix, count, conn)]
@@ -0,0 +1,79 @@
+import asyncio
+import threading
+
+# Pending events per subscriber before the oldest ones are dropped
+MAX_PENDING_EVENTS = 100
+
+_subscribers = set()
+_lock = threading.Lock()
+_sequence = 0  # seq of the last published event in this process
+
+# Queued in place of a slow client's backlog: the stream sends a fresh snapshot
+RESYNC = {'type': 'resync'}
+
+def subscribe():
+    """Registra un suscriptor en el loop actual y devuelve su cola de eventos"""
+    queue = asyncio.Queue(maxsize=MAX_PENDING_EVENTS)
+    with _lock:
+        _subscribers.add((asyncio.get_running_loop(), queue))
+    return queue
+
+def unsubscribe(queue):
+    with _lock:
+        for subscriber in [s for s in _subscribers if s[1] is queue]:
+            _subscribers.discard(subscriber)
+
+def last_sequence():
+    with _lock:
+        return _sequence
+
+def _deliver(queue, event):
+    if queue.full():
+        # Slow client: drop its backlog instead of silently losing deltas
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(RESYNC)
+        return
+    queue.put_nowait(event)
+
+def publish(event: dict):
+    """Envía un evento a todos los suscriptores; seguro desde cualquier hilo.
+
+    Cada evento lleva un seq creciente, en el orden en que se entrega.
+    Llamar solo después del commit que produjo el cambio.
+    """
+    global _sequence
+    closed = []
+    with _lock:
+        _sequence += 1
+        event = {**event, 'seq': _sequence}
+        # Scheduled under the lock so every queue receives events in seq order
+        for loop, queue in _subscribers:
+            try:
+                loop.call_soon_threadsafe(_deliver, queue, event)
+            except RuntimeError:
+                closed.append(queue)  # loop already closed
+    for queue in closed:
+        unsubscribe(queue)
+
+def stock_crossing(product, previous_stock: int, previous_min_stock: int = None):
+    """Evento si el cambio de stock (o de min_stock) cruzó el umbral, o None"""
+    if previous_min_stock is None:
+        previous_min_stock = product.min_stock
+    was_low = previous_stock <= previous_min_stock
+    is_low = product.stock <= product.min_stock
+    if was_low == is_low or not product.is_active:
+        return None
+    return {
+        'type': 'low_stock' if is_low else 'stock_ok',
+        'product_id': product.id,
+        'product_code': product.code,
+        'product_name': product.name,
+        'current_stock': product.stock,
+        'min_stock': product.min_stock
+    }
+
+def publish_all(events):
+    for event in events:
+        if event:
+            publish(event)
@@ -0,0 +1,115 @@
+from collections import OrderedDict
+import threading
+import time
+import config
+import database
+
+class MetricsCache:
+    """Caché en memoria para un valor calculado, invalidado por las escrituras.
+
+    Un valor se sirve mientras no haya habido escrituras en este proceso y
+    tenga menos de max_age segundos; el límite acota cuán desactualizado
+    puede estar frente a escrituras hechas por otros workers.
+
+    Si se calcula sobre una réplica, los valores obtenidos menos de
+    settle segundos después de una escritura se guardan solo por settle
+    segundos: la réplica todavía podría no tenerla.
+
+    Guarda hasta max_entries claves (las menos usadas salen primero); una
+    escritura invalida todas.
+    """
+
+    def __init__(self, max_age: float, settle: float = 0.0, max_entries: int = 1):
+        self.max_age = max_age
+        self.settle = settle
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._entries = OrderedDict()  # key -> (value, generation, computed_at, max_age)
+        self._invalidated_at = float('-inf')
+
+    def get(self, key, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+            if (
+                entry is not None
+                and entry[1] == self._generation
+                and time.monotonic() - entry[2] < entry[3]
+            ):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            generation = self._generation
+        started = time.monotonic()
+        value = compute()
+        with self._lock:
+            # Skip storing if a write landed while computing; keep it only
+            # briefly if the replica may not have the last write yet
+            if generation == self._generation:
+                settling = started - self._invalidated_at < self.settle
+                max_age = min(self.settle, self.max_age) if settling else self.max_age
+                self._entries[key] = (value, generation, time.monotonic(), max_age)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def settling(self):
+        """True si hubo una escritura hace menos de settle segundos"""
+        with self._lock:
+            return time.monotonic() - self._invalidated_at < self.settle
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            self._invalidated_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            fresh = [
+                computed_at for _, generation, computed_at, _ in self._entries.values()
+                if generation == self._generation
+            ]
+            requests = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_ratio': self.hits / requests if requests else 0.0,
+                'max_age_seconds': self.max_age,
+                'entries': len(fresh),
+                'age_seconds': time.monotonic() - max(fresh) if fresh else None
+            }
+
+# Settling only matters when reads can go to a separate replica
+REPLICA_SETTLE_SECONDS = config.REPLICA_MAX_LAG_SECONDS if database.read_engine is not database.engine else 0.0
+
+dashboard_metrics = MetricsCache(
+    config.DASHBOARD_CACHE_MAX_AGE_SECONDS,
+    settle=REPLICA_SETTLE_SECONDS
+)
+
+# Dashboard snapshots for /dashboard/stream keyed by (day, event seq): a write
+# in this process publishes a new seq, so entries need no invalidation
+dashboard_stream = MetricsCache(config.DASHBOARD_CACHE_MAX_AGE_SECONDS)
+
+# Per-window answers of /reports/heatmap, invalidated by sale writes (max age
+# bounds the rest, e.g. products moved to another category)
+sales_heatmap = MetricsCache(
+    config.HEATMAP_CACHE_MAX_AGE_SECONDS,
+    settle=REPLICA_SETTLE_SECONDS,
+    max_entries=config.HEATMAP_CACHE_SIZE
+)
+
+# Whole-catalog ABC classifications behind the /reports/abc pages, invalidated
+# by sale writes like the heatmap
+abc_report = MetricsCache(
+    config.ABC_CACHE_MAX_AGE_SECONDS,
+    settle=REPLICA_SETTLE_SECONDS,
+    max_entries=config.ABC_CACHE_SIZE
+)
\ No newline at end of file
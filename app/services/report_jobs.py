@@ -0,0 +1,53 @@
+"""Background execution of report jobs (POST /reports/jobs).
+
+Jobs run on a small thread pool in this process, on a read session with
+its own statement timeout; status and results live in report_jobs, so any
+worker can answer GET /reports/jobs/{id}.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from sqlalchemy import text
+
+import config
+from database import SessionLocal, read_session
+from crud import report_job_crud
+
+_executor = ThreadPoolExecutor(max_workers=config.REPORT_JOB_WORKERS, thread_name_prefix="report-job")
+_pending_lock = threading.Lock()
+_pending = set()  # ids submitted to _executor and not finished yet
+
+def _set_statement_timeout(db, seconds: float):
+    if db.get_bind().dialect.name == 'postgresql':
+        # LOCAL: ends with the transaction, the pooled connection is not affected
+        db.execute(text(f"SET LOCAL statement_timeout = {int(seconds * 1000)}"))
+
+def _execute(job_id: str, run):
+    db = SessionLocal()
+    try:
+        report_job_crud.mark_running(db, job_id)
+        read_db = read_session()
+        try:
+            _set_statement_timeout(read_db, config.REPORT_JOB_STATEMENT_TIMEOUT_SECONDS)
+            result = run(read_db)
+        finally:
+            read_db.close()
+        report_job_crud.mark_done(db, job_id, result)
+    except Exception as e:
+        db.rollback()
+        # First line only: driver errors go on to quote the SQL
+        report_job_crud.mark_failed(db, job_id, str(e).splitlines()[0] if str(e) else type(e).__name__)
+    finally:
+        db.close()
+        with _pending_lock:
+            _pending.discard(job_id)
+
+def submit(job_id: str, run):
+    """Encola run(db) para el job; su resultado (JSON) se guarda en report_jobs"""
+    with _pending_lock:
+        _pending.add(job_id)
+    _executor.submit(_execute, job_id, run)
+
+def is_pending(job_id: str):
+    """True si el job está en la cola o ejecutándose en este proceso"""
+    with _pending_lock:
+        return job_id in _pending
@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+
+# Never run against the DATABASE_URL of a real deployment: the tests write rows
+os.environ["DATABASE_URL"] = os.getenv(
+    "TEST_DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "pos_test.db")
+)
+os.environ.pop("DATABASE_READ_URL", None)
+os.environ.pop("DATABASE_ASYNC", None)
+
+# Imports are rooted at app/, like when running uvicorn main:app from there
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,135 @@
+"""Query-count regression test for the list and detail reads.
+
+Serializes each read with its response schema at two page sizes and
+asserts the number of SQL statements is the expected fixed count, so a
+relationship left to lazy loading shows up as a failure. Run from the
+app directory:
+
+    python -m pytest tests
+"""
+import uuid
+
+import pytest
+from sqlalchemy import event
+
+from database import Base, engine, SessionLocal
+from models.category import Category
+from models.supplier import Supplier
+from models.product import Product
+from models.sale import Sale
+from models.sale_detail import SaleDetail
+from models.purchase_order import PurchaseOrder
+from models.purchase_order_detail import PurchaseOrderDetail
+from crud import sale_crud, product_crud, purchase_order_crud
+from schemas import sale_schema, product_schema, purchase_order_schemas
+
+LINES_PER_DOCUMENT = 3
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(engine, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine, "before_cursor_execute", self)
+
+
+def seed(db, documents):
+    run_id = uuid.uuid4().hex[:8]
+    categories = [Category(name=f"Cat {run_id}-{i}") for i in range(documents)]
+    suppliers = [
+        Supplier(name=f"Sup {run_id}-{i}", contact_person="Bench", phone=f"{run_id}-{i}")
+        for i in range(documents)
+    ]
+    db.add_all(categories + suppliers)
+    db.flush()
+    products = [
+        Product(
+            code=f"QC-{run_id}-{i}", name=f"Product {i}", price=1.0, stock=100,
+            category_id=categories[i].id, supplier_id=suppliers[i].id
+        )
+        for i in range(documents)
+    ]
+    db.add_all(products)
+    db.flush()
+    for i in range(documents):
+        lines = [products[(i + n) % documents] for n in range(LINES_PER_DOCUMENT)]
+        db.add(Sale(total=3.0, payment_method="efectivo", sale_details=[
+            SaleDetail(product_id=p.id, quantity=1, unit_price=1.0, subtotal=1.0) for p in lines
+        ]))
+        db.add(PurchaseOrder(
+            order_number=f"QC-{run_id}-{i}", supplier_id=suppliers[i].id,
+            purchase_order_details=[
+                PurchaseOrderDetail(product_id=p.id, quantity_ordered=1, unit_cost=1.0, total_cost=1.0)
+                for p in lines
+            ]
+        ))
+    db.commit()
+
+
+def count_queries(read):
+    db = SessionLocal()
+    try:
+        with QueryCounter() as counter:
+            read(db)
+        return counter.count
+    finally:
+        db.close()
+
+
+# Statements per read: the main query plus one per eager-loaded collection
+EXPECTED_QUERIES = {
+    "GET /sales/": 2,
+    "GET /sales/{id}": 2,
+    "GET /products": 1,
+    "GET /purchase-orders/": 2,
+    "GET /purchase-orders/{id}": 2,
+}
+
+READS = {
+    "GET /sales/": lambda db, n: [
+        sale_schema.Sale.model_validate(s) for s in sale_crud.get_sales(db, limit=n)
+    ],
+    "GET /sales/{id}": lambda db, n: sale_schema.Sale.model_validate(sale_crud.get_sale(db, 1)),
+    "GET /products": lambda db, n: [
+        product_schema.Product.model_validate(p) for p in product_crud.get_products(db)
+    ],
+    "GET /purchase-orders/": lambda db, n: [
+        purchase_order_schemas.PurchaseOrder.model_validate(o)
+        for o in purchase_order_crud.get_purchase_orders(db, limit=n)
+    ],
+    "GET /purchase-orders/{id}": lambda db, n: purchase_order_schemas.PurchaseOrder.model_validate(
+        purchase_order_crud.get_purchase_order(db, 1)
+    ),
+}
+
+
+@pytest.fixture(scope="module")
+def counts():
+    Base.metadata.create_all(bind=engine)
+    counts = {}
+    seeded = 0
+    for documents in (10, 100):
+        db = SessionLocal()
+        try:
+            seed(db, documents - seeded)
+            seeded = documents
+        finally:
+            db.close()
+        counts[documents] = {
+            name: count_queries(lambda db: read(db, documents)) for name, read in READS.items()
+        }
+    return counts
+
+
+@pytest.mark.parametrize("name", list(READS))
+def test_query_count_is_fixed(counts, name):
+    assert counts[10][name] == EXPECTED_QUERIES[name], f"{name} at 10 rows"
+    assert counts[100][name] == EXPECTED_QUERIES[name], f"{name} at 100 rows"
@@ -1,10 +1,59 @@
-import React from 'react';
+import React, { useState } from 'react';
 import { FileText, DollarSign, Package, AlertTriangle } from 'lucide-react';
 import MetricCard from './MetricCard';
-import { useApi } from '../hooks/useApi';
+import { useApi, useEventStream } from '../hooks/useApi';
+
+const STREAM_EVENTS = ['metrics', 'sale', 'sale_deleted', 'low_stock', 'stock_ok', 'product_added', 'product_removed'];
+
+const isToday = (fecha) => {
+  const now = new Date();
+  const today = `${now.getFullYear()}-${String(now.getMonth() + 1).padStart(2, '0')}-${String(now.getDate()).padStart(2, '0')}`;
+  return fecha.slice(0, 10) === today;
+};
+
+// Applies a stream event to the current metrics; deltas the last snapshot
+// already counted (seq at or below its seq) are skipped
+const applyEvent = (metrics, event) => {
+  if (event.type === 'metrics') {
+    const { type, resync, ...snapshot } = event;
+    return snapshot;
+  }
+  if (!metrics || event.seq <= metrics.seq) return metrics;
+  switch (event.type) {
+    case 'sale':
+    case 'sale_deleted': {
+      if (!isToday(event.fecha)) return metrics;
+      const sign = event.type === 'sale' ? 1 : -1;
+      return {
+        ...metrics,
+        daily_sales: metrics.daily_sales + sign,
+        daily_revenue: metrics.daily_revenue + sign * event.total,
+      };
+    }
+    case 'low_stock':
+    case 'stock_ok':
+      return {
+        ...metrics,
+        low_stock_count: metrics.low_stock_count + (event.type === 'low_stock' ? 1 : -1),
+      };
+    case 'product_added':
+    case 'product_removed': {
+      const sign = event.type === 'product_added' ? 1 : -1;
+      return {
+        ...metrics,
+        total_products: metrics.total_products + sign,
+        low_stock_count: metrics.low_stock_count + (event.low_stock ? sign : 0),
+      };
+    }
+    default:
+      return metrics;
+  }
+};
 
 const Dashboard = () => {
-  const { data: metrics, loading: metricsLoading } = useApi('/dashboard/metrics');
+  const [metrics, setMetrics] = useState(null);
+  useEventStream('/dashboard/stream', STREAM_EVENTS, (event) => setMetrics((current) => applyEvent(current, event)));
+  const metricsLoading = metrics === null;
   const { data: bestSelling, loading: bestSellingLoading } = useApi('/dashboard/best-selling');
   const { data: products, loading: stockLoading } = useApi('/products');
 
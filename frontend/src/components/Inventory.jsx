@@ -1,6 +1,6 @@
 import React, { useState } from 'react';
 import { Search, AlertTriangle, Package, Plus, Truck, CheckCircle, Edit3, ChevronDown, ChevronRight, Eye, ShoppingCart, X } from 'lucide-react';
-import { useApi, useApiMutation } from '../hooks/useApi';
+import { useApi, useApiMutation, useEventStream } from '../hooks/useApi';
 import apiService from '../services/api';
 
 const Inventory = () => {
@@ -24,6 +24,18 @@ const Inventory = () => {
   });
 
   const { data: lowStockItems, loading: stockLoading, refetch: refetchStock } = useApi('/inventory/low-stock');
+  // Reload the low-stock list only when a product enters or leaves it, or
+  // when the stream resyncs after missing events
+  useEventStream(
+    '/dashboard/stream',
+    ['metrics', 'low_stock', 'stock_ok', 'product_added', 'product_removed'],
+    (event) => {
+      const changed = event.type === 'metrics'
+        ? event.resync
+        : event.type === 'low_stock' || event.type === 'stock_ok' || event.low_stock;
+      if (changed) refetchStock();
+    }
+  );
   const { data: suppliers, loading: suppliersLoading, refetch: refetchSuppliers } = useApi('/suppliers');
   const { data: purchaseOrders, loading: ordersLoading, refetch: refetchOrders } = useApi('/purchase-orders');
   const { data: allProducts, loading: productsLoading } = useApi('/products');
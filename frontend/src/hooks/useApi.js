@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import apiService from '../services/api';
 
 export const useApi = (endpoint, dependencies = []) => {
@@ -47,4 +47,15 @@ export const useApiMutation = () => {
   };
 
   return { mutate, loading, error };
-};
\ No newline at end of file
+};
+
+export const useEventStream = (endpoint, eventTypes, onEvent) => {
+  const handlerRef = useRef(onEvent);
+  handlerRef.current = onEvent;
+
+  // Components subscribed to the same endpoint share one connection
+  useEffect(() => {
+    return apiService.subscribe(endpoint, eventTypes, (event) => handlerRef.current(event));
+    // eslint-disable-next-line
+  }, [endpoint]);
+};
@@ -1,6 +1,14 @@
 const API_BASE_URL = 'http://localhost:8000';
 
+// Events kept for components that join a shared stream after its last
+// 'metrics' snapshot; the server sends a new one at least every minute
+const STREAM_REPLAY_LIMIT = 1000;
+
 class ApiService {
+  constructor() {
+    this.streams = {};
+  }
+
   async request(endpoint, options = {}) {
     const url = `${API_BASE_URL}${endpoint}`;
     const config = {
@@ -25,6 +33,58 @@ class ApiService {
     }
   }
 
+  // Server-sent events: one EventSource per endpoint shared by every
+  // component on the page (EventSource reconnects on its own). Returns the
+  // function that unsubscribes.
+  subscribe(endpoint, eventTypes, onEvent) {
+    const subscriber = { eventTypes, onEvent };
+    let stream = this.streams[endpoint];
+    if (!stream) {
+      stream = this.openStream(endpoint, eventTypes, new Set());
+    } else if (eventTypes.some((type) => !stream.eventTypes.has(type))) {
+      // New event types: reopen so every subscriber starts from a fresh snapshot
+      stream.source.close();
+      stream = this.openStream(endpoint, [...stream.eventTypes, ...eventTypes], stream.subscribers);
+    } else {
+      stream.replay.filter((event) => eventTypes.includes(event.type)).forEach(onEvent);
+    }
+    stream.subscribers.add(subscriber);
+    this.streams[endpoint] = stream;
+
+    return () => {
+      const current = this.streams[endpoint];
+      current.subscribers.delete(subscriber);
+      if (!current.subscribers.size) {
+        current.source.close();
+        delete this.streams[endpoint];
+      }
+    };
+  }
+
+  openStream(endpoint, eventTypes, subscribers) {
+    const stream = {
+      source: new EventSource(`${API_BASE_URL}${endpoint}`),
+      eventTypes: new Set(eventTypes),
+      subscribers,
+      replay: [],
+    };
+    const dispatch = (message) => {
+      const event = JSON.parse(message.data);
+      if (event.type === 'metrics') {
+        stream.replay = [event];
+      } else if (stream.replay.length >= STREAM_REPLAY_LIMIT) {
+        stream.replay = [];  // late joiners wait for the next snapshot
+      } else if (stream.replay.length) {
+        stream.replay.push(event);
+      }
+      stream.subscribers.forEach((subscriber) => {
+        if (subscriber.eventTypes.includes(event.type)) subscriber.onEvent(event);
+      });
+    };
+    stream.eventTypes.forEach((type) => stream.source.addEventListener(type, dispatch));
+    return stream;
+  }
+
   // Dashboard endpoints
   async getDashboardMetrics() {
     return this.request('/dashboard/metrics');